@@ -25,7 +25,7 @@ FETCH_RPMS = "rpm -qa --qf '%{NAME} %{RSAHEADER:pgpsig}\n'"
 RH_KEY_ID = "199e2f91fd431d51"
 GPG_RPM = "gpg-pubkey"
 
-USING_TEST_REGISTRY = Config.get_registry_data(RHUA)[0] != OFFICIAL_REGISTRY
+USING_TEST_REGISTRY = Config.get_registry_data(RHUA).hostname != OFFICIAL_REGISTRY
 
 def setup():
     """announce the beginning of the test run"""
@@ -63,9 +63,9 @@ class TestCompsXML():
             RHUIManagerCLIInstance.add(RHUA, "cds", unsafe=True)
             RHUIManagerCLIInstance.add(RHUA, "haproxy", unsafe=True)
         # check that
-        cds_list = RHUIManagerCLIInstance.list(RHUA, "cds")
+        cds_list = RHUIManagerCLIInstance.inventory(RHUA, "cds")
         nose.tools.ok_(cds_list)
-        hap_list = RHUIManagerCLIInstance.list(RHUA, "haproxy")
+        hap_list = RHUIManagerCLIInstance.inventory(RHUA, "haproxy")
         nose.tools.ok_(hap_list)
 
     def test_02_add_repos(self):
@@ -87,14 +87,14 @@ class TestClient():
                                       self.container_name,
                                       self.container_id,
                                       self.container_displayname,
-                                      [""] + credentials)
+                                      ["", *credentials])
         # second, add a container from Quay
         # get Quay credentials
         credentials = Config.get_credentials(RHUA, "quay")
         quay_url = Config.get_registry_url("quay")
         RHUIManagerRepo.add_container(RHUA,
                                       self.container_quay["name"],
-                                      credentials=[quay_url] + credentials)
+                                      credentials=[quay_url, *credentials])
         # third, add a container from GitLab
         gitlab_url = Config.get_registry_url("gitlab")
         RHUIManagerRepo.add_container(RHUA,
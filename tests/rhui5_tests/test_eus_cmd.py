@@ -78,7 +78,7 @@ class TestEUSCLI():
         if not getenv("RHUISKIPSETUP"):
             RHUIManagerCLIInstance.add(RHUA, "cds", unsafe=True)
         # check that
-        cds_list = RHUIManagerCLIInstance.list(RHUA, "cds")
+        cds_list = RHUIManagerCLIInstance.inventory(RHUA, "cds")
         nose.tools.ok_(cds_list)
 
     @staticmethod
@@ -89,7 +89,7 @@ class TestEUSCLI():
         if not getenv("RHUISKIPSETUP"):
             RHUIManagerCLIInstance.add(RHUA, "haproxy", unsafe=True)
         # check that
-        hap_list = RHUIManagerCLIInstance.list(RHUA, "haproxy")
+        hap_list = RHUIManagerCLIInstance.inventory(RHUA, "haproxy")
         nose.tools.ok_(hap_list)
 
     @staticmethod
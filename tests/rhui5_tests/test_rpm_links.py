@@ -0,0 +1,111 @@
+'''Tests for fetching RPM links from web pages'''
+
+# These tests need no RHUI: the pages are served by a local HTTP server running in a thread.
+
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import os
+from os.path import basename
+import shutil
+import tempfile
+import threading
+
+import logging
+import nose
+
+from rhui5_tests_lib import util
+from rhui5_tests_lib.util import Util
+
+logging.basicConfig(level=logging.DEBUG)
+
+# enough packages for the directory listing to span several chunks of the response stream
+RPMS = sorted(f"rhui-test-pkg-{index}-1.0-1.noarch.rpm" for index in range(3000))
+STATIC_RPMS = ["first-1-1.noarch.rpm", "second-2-1.x86_64.rpm"]
+
+class _Handler(SimpleHTTPRequestHandler):
+    '''
+    serve files from the test directory quietly, and remember the status codes
+    '''
+    codes = []
+
+    def log_request(self, code="-", size="-"):
+        _Handler.codes.append(int(code))
+
+    def log_message(self, *args):
+        pass
+
+TEST_DIR = tempfile.mkdtemp()
+SERVER = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Handler, directory=TEST_DIR))
+BASE_URL = f"http://127.0.0.1:{SERVER.server_address[1]}"
+
+def setup():
+    '''
+    announce the beginning of the test run, prepare the pages, and start the server
+    '''
+    print(f"*** Running {basename(__file__)}: ***")
+    # a directory listing generated by the server
+    os.mkdir(os.path.join(TEST_DIR, "listing"))
+    for rpm in RPMS:
+        with open(os.path.join(TEST_DIR, "listing", rpm), "w", encoding="utf-8"):
+            pass
+    # a static page, served with a Last-Modified header
+    os.mkdir(os.path.join(TEST_DIR, "static"))
+    with open(os.path.join(TEST_DIR, "static", "index.html"), "w", encoding="utf-8") as page:
+        page.write("<html><body>\n" +
+                   "".join(f"<a href=\"{rpm}\">{rpm}</a>\n" for rpm in STATIC_RPMS) +
+                   "<a href=\"README\">README</a>\n</body></html>\n")
+    # a page with no RPM links
+    os.mkdir(os.path.join(TEST_DIR, "empty"))
+    threading.Thread(target=SERVER.serve_forever, daemon=True).start()
+    util._RPM_LINK_CACHE.clear() # pylint: disable=protected-access
+
+def test_01_listing():
+    '''
+    check if all the RPM links in a directory listing are found
+    '''
+    rpms = Util.get_rpm_links(f"{BASE_URL}/listing/")
+    nose.tools.eq_(sorted(rpms), RPMS)
+
+def test_02_static_page():
+    '''
+    check if the RPM links, and only them, are found in a static page
+    '''
+    _Handler.codes.clear()
+    rpms = Util.get_rpm_links(f"{BASE_URL}/static/")
+    nose.tools.eq_(rpms, STATIC_RPMS)
+    nose.tools.eq_(_Handler.codes, [200])
+
+def test_03_not_modified():
+    '''
+    check if the links from the unchanged static page are reused after a 304 response
+    '''
+    _Handler.codes.clear()
+    rpms = Util.get_rpm_links(f"{BASE_URL}/static/")
+    nose.tools.eq_(rpms, STATIC_RPMS)
+    nose.tools.eq_(_Handler.codes, [304])
+
+def test_04_no_rpms():
+    '''
+    check if a page without RPM links is reported as such
+    '''
+    nose.tools.assert_raises(RuntimeError, Util.get_rpm_links, f"{BASE_URL}/empty/")
+
+def test_05_multi():
+    '''
+    check if several pages are crawled at once, with missing pages considered empty
+    '''
+    urls = [f"{BASE_URL}/listing/", f"{BASE_URL}/static/", f"{BASE_URL}/missing/"]
+    links = Util.get_rpm_links_multi(urls)
+    nose.tools.eq_(list(links), urls)
+    nose.tools.eq_(sorted(links[urls[0]]), RPMS)
+    nose.tools.eq_(links[urls[1]], STATIC_RPMS)
+    nose.tools.eq_(links[urls[2]], [])
+
+def teardown():
+    '''
+    stop the server, clean up, and announce the end of the test run
+    '''
+    SERVER.shutdown()
+    SERVER.server_close()
+    shutil.rmtree(TEST_DIR)
+    print(f"*** Finished running {basename(__file__)}. ***")
@@ -1,5 +1,6 @@
 """Test case for sosreport and RHUI"""
 
+import json
 import logging
 from os.path import basename
 from shutil import rmtree
@@ -15,6 +16,7 @@ logging.basicConfig(level=logging.DEBUG)
 
 TMPDIR = mkdtemp()
 SOSREPORT_LOCATION = f"{TMPDIR}/sosreport_location_rhua"
+INSPECTION_RESULT = f"{TMPDIR}/sosreport_inspection_rhua.json"
 
 RHUA = ConMgr.connect()
 
@@ -41,6 +43,13 @@ WANTED_FILES = RHUI_FILES + \
                [Sos.containerized_path(file) for file in PULP_FILES] + \
                [Sos.encode_sos_command(cmd) for cmd in RHUI_CMDS]
 
+# known confidential information: (option, file) tuples
+OBFUSCATION_CHECKS = [
+                      ("csrftoken", "/var/lib/rhui/root/.rhui/http-localhost:24817/cookies.txt"),
+                      ("sessionid", "/var/lib/rhui/root/.rhui/http-localhost:24817/cookies.txt"),
+                      ("podman_password", "/var/lib/rhui/config/rhua/rhui-tools.conf"),
+                     ]
+
 def setup():
     """announce the beginning of the test run"""
     print(f"*** Running {basename(__file__)}: ***")
@@ -61,23 +70,17 @@ def test_02_rhua_sosreport_check():
     """check if the sosreport archive from the RHUA node contains the desired files"""
     with open(SOSREPORT_LOCATION, encoding="utf-8") as location:
         sosreport_location = location.read()
-    Sos.check_files_in_archive(RHUA, WANTED_FILES, sosreport_location)
+    # all the checks are done in one pass over the archive; keep the result for the next test
+    result = Sos.inspect_archive(RHUA, sosreport_location, WANTED_FILES, OBFUSCATION_CHECKS)
+    with open(INSPECTION_RESULT, "w", encoding="utf-8") as inspection:
+        json.dump(result, inspection)
+    Sos.check_inspected_files(result)
 
 def test_03_check_confidential_data():
     """check if known confidential information is obfuscated in the archive"""
-    with open(SOSREPORT_LOCATION, encoding="utf-8") as location:
-        sosreport_location = location.read()
-    # cookies
-    for cookie in ["csrftoken", "sessionid"]:
-        Sos.is_obfuscated(RHUA,
-                          cookie,
-                          "/var/lib/rhui/root/.rhui/http-localhost:24817/cookies.txt",
-                          sosreport_location)
-    # container registry password
-    Sos.is_obfuscated(RHUA,
-                      "podman_password",
-                      "/var/lib/rhui/config/rhua/rhui-tools.conf",
-                      sosreport_location)
+    with open(INSPECTION_RESULT, encoding="utf-8") as inspection:
+        result = json.load(inspection)
+    Sos.check_inspected_obfuscation(result)
 
 def test_99_cleanup():
     """delete the archive and its checksum file, local cache"""
@@ -0,0 +1,63 @@
+"""Agents: Python Scripts Executed on the Remote Hosts"""
+
+# Some checks would take thousands of commands over SSH, or would have to transfer lots of data
+# to the test machine. Instead, such work is done on the remote host by an agent: a standalone
+# script in this package that only uses the Python standard library and prints its result
+# as JSON on stdout (or, if the result is too big to be held in memory, as a stream to be parsed
+# while the agent is running; see start() and check()). The source code is passed to the remote
+# Python interpreter on stdin, so nothing has to be installed on the remote host.
+# Keep the agents compatible with the oldest Python version on the hosts they run on:
+# 3.6 on the RHUA (RHEL 8 platform-python), and also 2.7 for agents that run on RHEL 7 clients.
+
+import json
+import os
+import shlex
+
+PYTHON = "$(command -v python3 || command -v /usr/libexec/platform-python || echo python)"
+# the interpreter with the system package manager bindings: dnf on RHEL 8+, yum on RHEL 7
+SYSTEM_PYTHON = "$(if [ -x /usr/libexec/platform-python ]; " \
+                "then echo /usr/libexec/platform-python; " \
+                "elif command -v dnf >/dev/null; then echo /usr/bin/python3; " \
+                "else echo /usr/bin/python; fi)"
+
+class AgentError(RuntimeError):
+    """
+    To be raised if an agent fails or returns unusable output.
+    """
+
+def source(name):
+    """return the source code of the agent with the given name"""
+    with open(os.path.join(os.path.dirname(__file__), f"{name}.py"), encoding="utf-8") as agent:
+        return agent.read()
+
+def start(connection, name, args=(), timeout=None, sudo=False, python=PYTHON):
+    """start the agent on the host with the given arguments; return its stdout and stderr"""
+    # for agents whose output is to be processed while they're running
+    cmd = f"{python} - {' '.join(shlex.quote(str(arg)) for arg in args)}"
+    if sudo:
+        cmd = f"sudo -n {cmd}"
+    stdin, stdout, stderr = connection.exec_command(cmd)
+    if timeout:
+        stdout.channel.settimeout(timeout)
+    stdin.write(source(name))
+    stdin.channel.shutdown_write()
+    return stdout, stderr
+
+def check(name, stdout, stderr, errors=None):
+    """raise an exception if the (finished) agent failed"""
+    # errors: the error output if the caller has already read stderr
+    ecode = stdout.channel.recv_exit_status()
+    if ecode:
+        if errors is None:
+            errors = stderr.read().decode()
+        raise AgentError(f"agent {name} failed with exit code {ecode}: {errors}")
+
+def run(connection, name, args=(), timeout=None, sudo=False, python=PYTHON):
+    """run the agent on the host with the given arguments and return its (decoded) JSON output"""
+    stdout, stderr = start(connection, name, args, timeout, sudo, python)
+    output = stdout.read().decode()
+    check(name, stdout, stderr)
+    try:
+        return json.loads(output)
+    except ValueError as err:
+        raise AgentError(f"agent {name} returned invalid output: {output[:200]}") from err
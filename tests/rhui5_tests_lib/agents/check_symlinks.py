@@ -0,0 +1,205 @@
+"""Agent: Check Symlinks to Artifacts"""
+
+# usage: check_symlinks.py [--deep] [--workers N] [--budget SECONDS] SYMLINK_DIR ARTIFACT_DIR
+# Checks that every symlink in SYMLINK_DIR points to an artifact in ARTIFACT_DIR that exists
+# and is a non-empty regular file, and with --deep, that the SHA-256 checksum of the artifact
+# matches its path in ARTIFACT_DIR. Also finds artifacts that no symlink points to.
+# The symlink tree is split into shards (directories) which are checked in a pool of worker
+# processes; so is the artifact tree. Progress is reported on stderr as lines starting with
+# "progress " followed by a JSON object. If the time budget runs out, the remaining shards
+# are skipped, the artifacts aren't checked, and the result is marked as incomplete.
+# Prints a JSON object with the counts and the (first) problems on stdout.
+
+import hashlib
+import json
+import multiprocessing
+import os
+import stat
+import sys
+import time
+
+MAX_ERRORS = 1000
+MAX_SHARD_DEPTH = 6
+SHARDS_PER_WORKER = 8
+# how often (in entries) to check whether the time budget has run out
+BUDGET_CHECK_INTERVAL = 1000
+
+# the set of referenced artifacts, inherited by the artifact checking processes
+REFERENCED = set()
+
+def artifact_digest(path):
+    """return the SHA-256 hex digest of the file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fobj:
+        for chunk in iter(lambda: fobj.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_shards(root, wanted):
+    """return a list of (directory, recursive) tuples covering the tree"""
+    # split the tree level by level until there are enough directories to balance the load;
+    # the directories on the levels that have been split are checked non-recursively
+    shards = []
+    level = [root]
+    depth = 0
+    while level:
+        if len(shards) + len(level) >= wanted or depth == MAX_SHARD_DEPTH:
+            shards.extend((directory, True) for directory in level)
+            break
+        next_level = []
+        for directory in level:
+            shards.append((directory, False))
+            try:
+                next_level.extend(entry.path for entry in os.scandir(directory)
+                                  if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+        level = sorted(next_level)
+        depth += 1
+    return shards
+
+def _entries(directory, recursive):
+    """yield the symlinks in the directory, and in its subdirectories if recursive"""
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_symlink():
+            yield entry.path
+        elif recursive and entry.is_dir(follow_symlinks=False):
+            for path in _entries(entry.path, True):
+                yield path
+
+def check_link(path, artifact_dir, deep):
+    """return a problem with the symlink, or None, and the artifact (relative path), or None"""
+    try:
+        target = os.readlink(path)
+    except OSError as err:
+        return "unreadable: %s" % err.strerror, None
+    resolved = os.path.normpath(os.path.join(os.path.dirname(path), target))
+    if not resolved.startswith(artifact_dir + "/"):
+        return "wrong target: outside the artifact directory", None
+    artifact = resolved[len(artifact_dir) + 1:]
+    try:
+        info = os.stat(resolved)
+    except OSError:
+        return "dangling", artifact
+    if not stat.S_ISREG(info.st_mode):
+        return "wrong target: not a regular file", artifact
+    if not info.st_size:
+        return "empty artifact", artifact
+    if deep:
+        # artifacts are stored as XX/YYYY..., where XXYYYY... is their SHA-256 checksum
+        try:
+            digest = artifact_digest(resolved)
+        except OSError as err:
+            return "unreadable artifact: %s" % err.strerror, artifact
+        if digest != artifact.replace("/", ""):
+            return "corrupt artifact: sha256 %s" % digest, artifact
+    return None, artifact
+
+def check_shard(args):
+    """check the symlinks in the shard; return the result"""
+    directory, recursive, artifact_dir, deep, deadline = args
+    result = {"links": 0, "problems": [], "referenced": [], "complete": True}
+    for path in _entries(directory, recursive):
+        if result["links"] % BUDGET_CHECK_INTERVAL == 0 and time.time() > deadline:
+            result["complete"] = False
+            break
+        result["links"] += 1
+        problem, artifact = check_link(path, artifact_dir, deep)
+        if artifact:
+            result["referenced"].append(artifact)
+        if problem:
+            result["problems"].append({"path": path, "problem": problem})
+    return result
+
+def check_artifacts(args):
+    """return the number of artifacts in the directory and the unreferenced ones"""
+    directory, artifact_dir, deadline = args
+    artifacts = 0
+    unreferenced = []
+    complete = True
+    for dirpath, _, filenames in os.walk(directory):
+        if time.time() > deadline:
+            complete = False
+            break
+        for filename in filenames:
+            artifacts += 1
+            artifact = os.path.join(dirpath, filename)[len(artifact_dir) + 1:]
+            if artifact not in REFERENCED:
+                unreferenced.append(artifact)
+    return artifacts, unreferenced, complete
+
+def progress(phase, done, total, result, start):
+    """report the progress on stderr"""
+    sys.stderr.write("progress %s\n" % json.dumps({"phase": phase,
+                                                    "done": done,
+                                                    "total": total,
+                                                    "links": result["links"],
+                                                    "problems": result["problem_count"],
+                                                    "seconds": round(time.time() - start, 1)}))
+    sys.stderr.flush()
+
+def main():
+    """parse the arguments, check the symlinks and artifacts, print the result"""
+    args = sys.argv[1:]
+    deep = "--deep" in args
+    args = [arg for arg in args if arg != "--deep"]
+    workers = 8
+    budget = None
+    if "--workers" in args:
+        workers = int(args[args.index("--workers") + 1])
+        del args[args.index("--workers"):args.index("--workers") + 2]
+    if "--budget" in args:
+        budget = float(args[args.index("--budget") + 1])
+        del args[args.index("--budget"):args.index("--budget") + 2]
+    symlink_dir, artifact_dir = [os.path.normpath(arg) for arg in args]
+    start = time.time()
+    deadline = start + budget if budget else float("inf")
+    result = {"links": 0,
+              "artifacts": 0,
+              "problem_count": 0,
+              "problems": [],
+              "unreferenced_count": 0,
+              "unreferenced": [],
+              "complete": True}
+    context = multiprocessing.get_context("fork")
+    shards = make_shards(symlink_dir, workers * SHARDS_PER_WORKER)
+    jobs = [(directory, recursive, artifact_dir, deep, deadline)
+            for directory, recursive in shards]
+    with context.Pool(workers) as pool:
+        for done, shard in enumerate(pool.imap_unordered(check_shard, jobs), 1):
+            result["links"] += shard["links"]
+            result["problem_count"] += len(shard["problems"])
+            result["problems"].extend(shard["problems"][:MAX_ERRORS - len(result["problems"])])
+            result["complete"] = result["complete"] and shard["complete"]
+            REFERENCED.update(shard["referenced"])
+            progress("symlinks", done, len(jobs), result, start)
+    # with an incomplete set of referenced artifacts, the unreferenced ones would be bogus
+    if result["complete"]:
+        try:
+            directories = sorted(entry.path for entry in os.scandir(artifact_dir)
+                                 if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            directories = []
+        jobs = [(directory, artifact_dir, deadline) for directory in directories]
+        # created now to inherit the set of referenced artifacts
+        with context.Pool(workers) as pool:
+            for done, (artifacts, unreferenced, complete) in \
+                    enumerate(pool.imap_unordered(check_artifacts, jobs), 1):
+                result["artifacts"] += artifacts
+                result["unreferenced_count"] += len(unreferenced)
+                result["unreferenced"].extend(unreferenced[:MAX_ERRORS -
+                                                           len(result["unreferenced"])])
+                result["complete"] = result["complete"] and complete
+                progress("artifacts", done, len(jobs), result, start)
+    result["problems"].sort(key=lambda problem: problem["path"])
+    result["unreferenced"].sort()
+    result["shards"] = len(shards)
+    result["seconds"] = time.time() - start
+    json.dump(result, sys.stdout)
+
+if __name__ == "__main__":
+    main()
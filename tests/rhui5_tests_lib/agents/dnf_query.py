@@ -0,0 +1,158 @@
+"""Agent: Answer Package Manager Queries on a Client"""
+
+# usage: dnf_query.py [--cacheonly] QUERIES_JSON
+# QUERIES_JSON is a list of queries, each of them a dict with the "query" key and possibly others:
+#   {"query": "repos"}                                 -> [{"id", "name", "enabled"}, ...]
+#   {"query": "groups"}                                -> [{"id", "name", "visible"}, ...]
+#   {"query": "group_packages", "group": NAME_OR_ID}   -> {"mandatory": [...], "default": [...],
+#                                                          "optional": [...], "conditional": [...]}
+#   {"query": "modules", "name": NAME}                 -> [{"name", "stream", "default",
+#                                                           "enabled", "profiles"}, ...]
+#   {"query": "updates", "packages": [NAME, ...]}      -> ["name-[epoch:]version-release.arch", ...]
+#   {"query": "urls", "packages": [NAME, ...]}         -> {NAME: URL, ...}
+# Prints a JSON list with the result of each query, or {"error": MESSAGE} if a query fails.
+# Uses the dnf API on RHEL 8+ and the yum API on RHEL 7, so it must run with the system Python,
+# which is Python 2.7 on RHEL 7.
+
+from __future__ import print_function
+
+import json
+import sys
+
+try:
+    import dnf
+    yum = None
+except ImportError:
+    dnf = None
+    import yum
+
+def _nevra(pkg):
+    """return the package NEVRA as a string, with the epoch only if it isn't 0"""
+    epoch = "%s:" % pkg.epoch if str(pkg.epoch) not in ("0", "None") else ""
+    return "%s-%s%s-%s.%s" % (pkg.name, epoch, pkg.version, pkg.release, pkg.arch)
+
+class DnfQueries(object):
+    """queries answered via the dnf API"""
+    def __init__(self, cacheonly):
+        self.base = dnf.Base()
+        self.base.conf.read()
+        self.base.conf.cacheonly = cacheonly
+        self.base.read_all_repos()
+        self.base.fill_sack(load_system_repo=True)
+        self.comps_read = False
+
+    def _comps(self):
+        if not self.comps_read:
+            self.base.read_comps(arch_filter=True)
+            self.comps_read = True
+        return self.base.comps
+
+    def repos(self, _):
+        return [{"id": repo.id, "name": repo.name, "enabled": repo.enabled}
+                for repo in sorted(self.base.repos.all(), key=lambda repo: repo.id)]
+
+    def groups(self, _):
+        return [{"id": group.id, "name": group.ui_name, "visible": group.visible}
+                for group in self._comps().groups]
+
+    def group_packages(self, query):
+        group = self._comps().group_by_pattern(query["group"])
+        if group is None:
+            raise ValueError("no such group: %s" % query["group"])
+        return {"mandatory": sorted(pkg.name for pkg in group.mandatory_packages),
+                "default": sorted(pkg.name for pkg in group.default_packages),
+                "optional": sorted(pkg.name for pkg in group.optional_packages),
+                "conditional": sorted(pkg.name for pkg in group.conditional_packages)}
+
+    def modules(self, query):
+        from dnf.module.module_base import ModuleBase
+        container = self.base._moduleContainer
+        modules, _ = ModuleBase(self.base).get_modules(query["name"])
+        streams = {}
+        for module in modules:
+            key = (module.getName(), module.getStream())
+            entry = streams.setdefault(key, {"name": key[0],
+                                             "stream": key[1],
+                                             "default": container.getDefaultStream(key[0]) ==
+                                                        key[1],
+                                             "enabled": container.isEnabled(key[0], key[1]),
+                                             "profiles": []})
+            for profile in module.getProfiles():
+                if profile.getName() not in entry["profiles"]:
+                    entry["profiles"].append(profile.getName())
+        return [streams[key] for key in sorted(streams)]
+
+    def updates(self, query):
+        upgrades = self.base.sack.query().upgrades().latest()
+        if query.get("packages"):
+            upgrades = upgrades.filter(name=query["packages"])
+        return sorted(_nevra(pkg) for pkg in upgrades)
+
+    def urls(self, query):
+        urls = {}
+        for name in query["packages"]:
+            available = self.base.sack.query().available().filter(name=name).latest()
+            urls[name] = available[0].remote_location() if available else None
+        return urls
+
+class YumQueries(object):
+    """queries answered via the yum API"""
+    def __init__(self, cacheonly):
+        self.base = yum.YumBase()
+        self.base.preconf.debuglevel = 0
+        self.base.preconf.errorlevel = 0
+        if cacheonly:
+            self.base.conf.cache = 1
+
+    def repos(self, _):
+        return [{"id": repo.id, "name": repo.name, "enabled": bool(repo.enabled)}
+                for repo in sorted(self.base.repos.repos.values(), key=lambda repo: repo.id)]
+
+    def groups(self, _):
+        return [{"id": group.groupid, "name": group.ui_name, "visible": bool(group.user_visible)}
+                for group in self.base.comps.groups]
+
+    def group_packages(self, query):
+        group = self.base.comps.return_group(query["group"])
+        if group is None:
+            raise ValueError("no such group: %s" % query["group"])
+        return {"mandatory": sorted(group.mandatory_packages),
+                "default": sorted(group.default_packages),
+                "optional": sorted(group.optional_packages),
+                "conditional": sorted(group.conditional_packages)}
+
+    def modules(self, _):
+        # no modularity on RHEL 7
+        return []
+
+    def updates(self, query):
+        updates = self.base.doPackageLists(pkgnarrow="updates").updates
+        if query.get("packages"):
+            updates = [pkg for pkg in updates if pkg.name in query["packages"]]
+        return sorted(_nevra(pkg) for pkg in updates)
+
+    def urls(self, query):
+        urls = {}
+        for name in query["packages"]:
+            try:
+                urls[name] = self.base.pkgSack.returnNewestByName(name)[0].remote_url
+            except yum.Errors.PackageSackError:
+                urls[name] = None
+        return urls
+
+def main():
+    """parse the arguments, answer the queries, print the results"""
+    args = sys.argv[1:]
+    cacheonly = "--cacheonly" in args
+    queries = json.loads([arg for arg in args if arg != "--cacheonly"][0])
+    answerer = DnfQueries(cacheonly) if dnf else YumQueries(cacheonly)
+    results = []
+    for query in queries:
+        try:
+            results.append(getattr(answerer, query["query"])(query))
+        except Exception as err: # pylint: disable=broad-except
+            results.append({"error": "%s: %s" % (type(err).__name__, err)})
+    json.dump(results, sys.stdout)
+
+if __name__ == "__main__":
+    main()
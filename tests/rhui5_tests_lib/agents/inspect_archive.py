@@ -0,0 +1,53 @@
+"""Agent: Inspect a Sos Report Archive"""
+
+# usage: inspect_archive.py ARCHIVE CHECKS_JSON
+# CHECKS_JSON is a dict with these keys (both optional):
+#   "files": [PATH, ...]                                -> paths that must be in the archive
+#   "obfuscated": [{"match": TEXT, "path": PATH}, ...]  -> files in which the value of each line
+#                                                          containing TEXT must be obfuscated
+# The paths are as seen on the host (or in the container), without the top directory of the
+# archive (sosreport-HOST-DATE-HASH). The archive is read once, as a stream, whatever
+# the compression, and all the checks are evaluated while reading it.
+# Prints a JSON object with the number of members, the missing files, and a result per
+# obfuscation check: whether the file was found and the lines that aren't obfuscated.
+
+import json
+import re
+import sys
+import tarfile
+
+MAX_PROBLEMS = 20
+OBFUSCATED_SUFFIX = "********"
+
+def main():
+    """parse the arguments, inspect the archive, print the result"""
+    archive, checks = sys.argv[1], json.loads(sys.argv[2])
+    wanted = set(checks.get("files", []))
+    obfuscation = [{"match": check["match"], "path": check["path"], "found": False, "problems": []}
+                   for check in checks.get("obfuscated", [])]
+    obfuscation_paths = set(check["path"] for check in obfuscation)
+    found = set()
+    members = 0
+    with tarfile.open(archive, "r|*") as tar:
+        for member in tar:
+            members += 1
+            path = re.sub("^[^/]+", "", member.name)
+            if path in wanted:
+                found.add(path)
+            if path not in obfuscation_paths or not member.isfile():
+                continue
+            lines = tar.extractfile(member).read().decode("utf-8", "replace").splitlines()
+            for check in obfuscation:
+                if check["path"] != path:
+                    continue
+                check["found"] = True
+                check["problems"] = [line for line in lines
+                                     if check["match"] in line and
+                                     not line.endswith(OBFUSCATED_SUFFIX)][:MAX_PROBLEMS]
+    json.dump({"members": members,
+               "missing": sorted(wanted - found),
+               "obfuscated": obfuscation},
+              sys.stdout)
+
+if __name__ == "__main__":
+    main()
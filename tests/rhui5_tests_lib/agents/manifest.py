@@ -0,0 +1,69 @@
+"""Agent: Write a Manifest of a Directory Tree"""
+
+# usage: manifest.py [--types fld] ROOT_DIR
+# Walks the tree and prints a gzip-compressed manifest on stdout: one line per entry of the wanted
+# types (f = regular file, l = symlink, d = directory), with tab-separated fields:
+#   path (relative to ROOT_DIR), type, size, mtime, inode, link target (symlinks only)
+# The lines are sorted by path, component by component (a directory is followed by its contents),
+# so that two manifests can be compared in one pass.
+# Backslashes, tabs and newlines in paths and targets are escaped with backslashes.
+
+import gzip
+import os
+import stat
+import sys
+
+def _escape(text):
+    """escape the characters used as separators"""
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+def walk(root, prefix=""):
+    """yield (relative path, type, stat result) for the tree, depth first, sorted by name"""
+    try:
+        entries = sorted(os.scandir(os.path.join(root, prefix) if prefix else root),
+                         key=lambda entry: entry.name)
+    except OSError:
+        return
+    for entry in entries:
+        path = prefix + entry.name
+        try:
+            info = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if stat.S_ISDIR(info.st_mode):
+            yield path, "d", info
+            for item in walk(root, path + "/"):
+                yield item
+        elif stat.S_ISLNK(info.st_mode):
+            yield path, "l", info
+        elif stat.S_ISREG(info.st_mode):
+            yield path, "f", info
+
+def main():
+    """parse the arguments, write the manifest"""
+    args = sys.argv[1:]
+    types = "fl"
+    if "--types" in args:
+        types = args[args.index("--types") + 1]
+        del args[args.index("--types"):args.index("--types") + 2]
+    root = args[0]
+    with gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb", compresslevel=1) as output:
+        for path, kind, info in walk(root):
+            if kind not in types:
+                continue
+            target = ""
+            if kind == "l":
+                try:
+                    target = os.readlink(os.path.join(root, path))
+                except OSError:
+                    pass
+            line = "\t".join([_escape(path),
+                              kind,
+                              str(info.st_size),
+                              str(int(info.st_mtime)),
+                              str(info.st_ino),
+                              _escape(target)])
+            output.write((line + "\n").encode("utf-8", "surrogateescape"))
+
+if __name__ == "__main__":
+    main()
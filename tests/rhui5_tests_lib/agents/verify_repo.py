@@ -0,0 +1,196 @@
+"""Agent: Verify Exported Repositories"""
+
+# usage: verify_repo.py [--deep] [--workers N] REPO_DIR...
+# For each exported repo directory, check that every metadata file listed in repomd.xml exists
+# and has the expected size and checksum, and that every package listed in primary.xml exists
+# (as a working symlink) and has the expected size, and with --deep, also the expected checksum.
+# Files are hashed in parallel threads, memory-mapped. Prints a JSON list with a result per repo.
+
+import bz2
+import collections
+import gzip
+import hashlib
+import json
+import lzma
+import mmap
+import os
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_ERRORS = 1000
+WINDOW = 256
+
+def _local(tag):
+    """return the tag name without the namespace"""
+    return tag.rsplit("}", 1)[-1]
+
+def _child(elem, tag):
+    """return the first child element with the given (local) tag name, or None"""
+    for child in elem:
+        if _local(child.tag) == tag:
+            return child
+    return None
+
+def _algorithm(checksum_type):
+    """return the hashlib name for a checksum type used in repodata"""
+    return "sha1" if checksum_type == "sha" else checksum_type
+
+def file_digest(path, algorithm):
+    """return the hex digest of the file, read via mmap"""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as fobj:
+        if os.fstat(fobj.fileno()).st_size:
+            mapped = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                digest.update(mapped)
+            finally:
+                mapped.close()
+    return digest.hexdigest()
+
+def open_metadata(path):
+    """return a binary stream with the decompressed contents of the metadata file"""
+    with open(path, "rb") as fobj:
+        head = fobj.read(6)
+    if head.startswith(b"\x1f\x8b"):
+        return gzip.open(path, "rb")
+    if head.startswith(b"\xfd7zXZ\x00"):
+        return lzma.open(path, "rb")
+    if head.startswith(b"BZh"):
+        return bz2.open(path, "rb")
+    if head.startswith(b"\x28\xb5\x2f\xfd"):
+        # no zstd in the standard library
+        return subprocess.Popen(["zstd", "-dc", path], stdout=subprocess.PIPE).stdout
+    return open(path, "rb")
+
+def check_file(path, size=None, checksum_type=None, checksum=None):
+    """return a problem with the file, or None; also return the number of bytes hashed"""
+    try:
+        actual_size = os.stat(path).st_size
+    except OSError as err:
+        if os.path.islink(path):
+            return "broken symlink", 0
+        return "missing: %s" % err.strerror, 0
+    if size is not None and actual_size != size:
+        return "size %d, expected %d" % (actual_size, size), 0
+    if checksum:
+        try:
+            actual = file_digest(path, _algorithm(checksum_type))
+        except (OSError, ValueError) as err:
+            return "unreadable: %s" % err, 0
+        if actual != checksum:
+            return "%s checksum %s, expected %s" % (checksum_type, actual, checksum), actual_size
+        return None, actual_size
+    return None, 0
+
+def bounded_map(executor, func, items, window=WINDOW):
+    """yield (arguments, result) of func for each tuple of arguments, in order"""
+    # like executor.map, but with a limited number of items in flight, to save memory
+    pending = collections.deque()
+    for item in items:
+        pending.append((item, executor.submit(func, *item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+def repomd_files(repo_dir):
+    """yield (type, path, size, checksum type, checksum) for the files listed in repomd.xml"""
+    tree = ET.parse(os.path.join(repo_dir, "repodata", "repomd.xml"))
+    for data in tree.getroot():
+        if _local(data.tag) != "data":
+            continue
+        location = _child(data, "location")
+        checksum = _child(data, "checksum")
+        size = _child(data, "size")
+        yield (data.get("type"),
+               os.path.join(repo_dir, location.get("href")),
+               int(size.text) if size is not None else None,
+               checksum.get("type"),
+               checksum.text.strip())
+
+def primary_packages(primary, repo_dir, deep):
+    """yield check_file arguments for the packages listed in the primary.xml file"""
+    root = None
+    stream = open_metadata(primary)
+    try:
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            if root is None:
+                root = elem
+            if event != "end" or _local(elem.tag) != "package":
+                continue
+            location = _child(elem, "location")
+            size = _child(elem, "size")
+            checksum = _child(elem, "checksum")
+            yield (os.path.join(repo_dir, location.get("href")),
+                   int(size.get("package")) if size is not None else None,
+                   checksum.get("type") if deep else None,
+                   checksum.text.strip() if deep else None)
+            elem.clear()
+            root.clear()
+    finally:
+        stream.close()
+
+def verify(repo_dir, deep, executor):
+    """check the repo in the given directory, return the result"""
+    start = time.time()
+    result = {"repo": repo_dir,
+              "metadata_files": 0,
+              "packages": 0,
+              "hashed_bytes": 0,
+              "errors": [],
+              "error_count": 0}
+
+    def error(path, problem):
+        result["error_count"] += 1
+        if len(result["errors"]) < MAX_ERRORS:
+            result["errors"].append({"path": path, "problem": problem})
+
+    try:
+        metadata = list(repomd_files(repo_dir))
+    except (OSError, ET.ParseError, AttributeError, ValueError) as err:
+        error(os.path.join(repo_dir, "repodata", "repomd.xml"), "unusable: %s" % err)
+        result["seconds"] = time.time() - start
+        return result
+    primaries = [path for datatype, path, _, _, _ in metadata if datatype == "primary"]
+    checks = [(path, size, checksum_type, checksum)
+              for _, path, size, checksum_type, checksum in metadata]
+    for (path, _, _, _), (problem, hashed) in bounded_map(executor, check_file, checks):
+        result["metadata_files"] += 1
+        result["hashed_bytes"] += hashed
+        if problem:
+            error(path, problem)
+            if path in primaries:
+                primaries.remove(path)
+    for primary in primaries:
+        packages = primary_packages(primary, repo_dir, deep)
+        try:
+            for (path, _, _, _), (problem, hashed) in bounded_map(executor, check_file, packages):
+                result["packages"] += 1
+                result["hashed_bytes"] += hashed
+                if problem:
+                    error(path, problem)
+        except (OSError, ET.ParseError, EOFError, lzma.LZMAError) as err:
+            error(primary, "unparsable: %s" % err)
+    result["seconds"] = time.time() - start
+    return result
+
+def main():
+    """parse the arguments, verify the repos, print the results"""
+    args = sys.argv[1:]
+    deep = "--deep" in args
+    workers = 8
+    if "--workers" in args:
+        workers = int(args[args.index("--workers") + 1])
+        del args[args.index("--workers"):args.index("--workers") + 2]
+    repo_dirs = [arg for arg in args if arg != "--deep"]
+    with ThreadPoolExecutor(workers) as executor:
+        results = [verify(repo_dir, deep, executor) for repo_dir in repo_dirs]
+    json.dump(results, sys.stdout)
+
+if __name__ == "__main__":
+    main()
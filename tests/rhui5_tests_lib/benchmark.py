@@ -0,0 +1,141 @@
+"""Benchmarks for the Library's Parsers"""
+
+# Each case feeds a parser with synthetic output of increasing size and measures the time
+# and the peak memory it takes. If the time per item grows much faster than the input,
+# the parser is likely to be quadratic (or worse) and will hurt at production scale.
+
+import gc
+import io
+import time
+import tracemalloc
+
+from rhui5_tests_lib import synthetic
+from rhui5_tests_lib.rhuimanager import RHUIManager
+from rhui5_tests_lib.rhuimanager_cmdline import RHUIManagerCLI, _ent_list
+from rhui5_tests_lib.rhuimanager_sync import RHUIManagerSync
+from rhui5_tests_lib.standin import ReplayConnection
+from rhui5_tests_lib.util import Util
+from rhui5_tests_lib.yummy import Yummy
+
+class Case():
+    """a parser and the way to prepare input of the given size for it"""
+    def __init__(self, name, unit, prepare, parse):
+        self.name = name
+        self.unit = unit
+        self.prepare = prepare
+        self.parse = parse
+
+def _list_lines(size):
+    """list_lines input: a repo listing followed by the prompt"""
+    lines = [f"  {repo['name']}" for repo in synthetic.repos(size)]
+    return "\r\n".join(lines) + "\r\nrhui (repo) => "
+
+def _select_items(size):
+    """select_items input: a selection screen, and the items to select (every 10th)"""
+    items = [repo["name"] for repo in synthetic.repos(size)]
+    screen = "\r\n".join(synthetic.selection_lines(items)) + "\r\n"
+    prompt = f"Enter value (1-{size}) to toggle selection, 'c' to confirm selections, " \
+             "or '?' for more commands: "
+    return screen + prompt, items[::10]
+
+def _proceed_with_check(size):
+    """proceed_with_check input: a summary of the selected repos, and the expected list"""
+    names = [repo["name"] for repo in synthetic.repos(size)]
+    caption = "The following repositories will be exported:"
+    output = f"{caption}\r\n" + "\r\n".join(f"  {name}" for name in names) + \
+             "\r\nProceed? (y/n) "
+    return output, caption, names
+
+CASES = [Case("RHUIManager.list_lines", "repos",
+              _list_lines,
+              lambda data: RHUIManager.list_lines(ReplayConnection(data), "rhui \\(repo\\) => ",
+                                                  False)),
+         Case("RHUIManager.select_items", "repos",
+              _select_items,
+              lambda data: RHUIManager.select_items(ReplayConnection(data[0]), data[1])),
+         Case("RHUIManager.proceed_with_check", "repos",
+              _proceed_with_check,
+              lambda data: RHUIManager.proceed_with_check(ReplayConnection(data[0]),
+                                                          data[1],
+                                                          data[2])),
+         Case("_ent_list", "entitlements",
+              lambda size: synthetic.cert_info_output(synthetic.entitlements(size)).encode(),
+              lambda data: _ent_list(io.BytesIO(data))),
+         Case("RHUIManagerCLI.repo_list", "repos",
+              lambda size: synthetic.repo_list_output(synthetic.repos(size)),
+              lambda data: RHUIManagerCLI.repo_list(ReplayConnection(data)).splitlines()),
+         Case("Util.lines_to_dict", "lines",
+              lambda size: [f"Option {index}:  value {index}" for index in range(size)],
+              Util.lines_to_dict),
+         Case("Yummy.comps_xml_grouplist", "groups",
+              synthetic.comps_xml,
+              lambda data: Yummy.comps_xml_grouplist(ReplayConnection(data), "comps.xml", False)),
+         Case("Yummy.comps_xml_langpacks", "langpacks",
+              lambda size: synthetic.comps_xml(10, langpacks=size),
+              lambda data: Yummy.comps_xml_langpacks(ReplayConnection(data), "comps.xml")),
+         Case("RHUIManagerSync.sync_errors", "repos",
+              lambda size: synthetic.sync_status_lines(synthetic.repos(size)),
+              lambda data: RHUIManagerSync.sync_errors(data, ignore_beta=[8, 9, 10],
+                                                       ignore_running=True,
+                                                       ignore_disabled=True)),
+         Case("RHUIManagerSync.sync_errors (pattern)", "repos",
+              lambda size: synthetic.sync_status_lines(synthetic.repos(size)),
+              lambda data: RHUIManagerSync.sync_errors(data, pattern="SAP"))]
+
+def measure(case, size, repeat=3):
+    """run the case with input of the given size; return the best time and the peak memory"""
+    data = case.prepare(size)
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        case.parse(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # memory is measured in a separate run as tracing slows the parser down considerably
+    gc.collect()
+    tracemalloc.start()
+    case.parse(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def run(sizes, cases=None, repeat=3, max_growth=4.0):
+    """run the (selected) cases with all the sizes; return a list of result dicts"""
+    # "growth" is the time per item at the biggest size divided by that at the smallest size;
+    # a linear parser stays around 1, a quadratic one grows with the size ratio
+    results = []
+    for case in CASES:
+        if cases and not any(wanted in case.name for wanted in cases):
+            continue
+        timings = []
+        for size in sizes:
+            elapsed, peak = measure(case, size, repeat)
+            timings.append((size, elapsed))
+            results.append({"case": case.name,
+                            "unit": case.unit,
+                            "size": size,
+                            "seconds": elapsed,
+                            "throughput": size / elapsed if elapsed else float("inf"),
+                            "peak_bytes": peak,
+                            "growth": None,
+                            "superlinear": False})
+        first_size, first_time = timings[0]
+        last_size, last_time = timings[-1]
+        if first_time and len(timings) > 1:
+            growth = (last_time / last_size) / (first_time / first_size)
+            results[-1]["growth"] = growth
+            results[-1]["superlinear"] = growth > max_growth
+    return results
+
+def report(results):
+    """return the results as a human-readable table"""
+    lines = [f"{'parser':<40} {'size':>8} {'seconds':>10} {'items/s':>12} {'peak MiB':>9}  growth"]
+    for result in results:
+        growth = f"{result['growth']:.2f}" if result["growth"] is not None else ""
+        if result["superlinear"]:
+            growth += " SUPERLINEAR"
+        lines.append(f"{result['case']:<40} {result['size']:>8} {result['seconds']:>10.4f} "
+                     f"{result['throughput']:>12.0f} {result['peak_bytes'] / 2**20:>9.2f}  "
+                     f"{growth}")
+    return "\n".join(lines)
@@ -1,6 +1,9 @@
 """Functions for the RHUI Configuration"""
 
+from collections import namedtuple
 from configparser import ConfigParser
+import io
+import weakref
 
 from stitches.expect import Expect
 
@@ -11,33 +14,171 @@ RHUI_CFG_HOST_BAK_DIR = "/var/lib/rhui/root"
 
 RHUI_ROOT = "/var/lib/rhui/remote_share"
 CREDS = "/root/test_files/credentials.conf"
+CREDS_HOST = f"{RHUI_CFG_HOST_BAK_DIR}{CREDS[len('/root'):]}"
 LEGACY_CA_DIR = "/etc/pki/rhui/legacy"
 
 OFFICIAL_REGISTRY = "registry.redhat.io"
 
+SESSION_SEPARATOR = "@@@ rhui-tools.conf @@@"
+
+Credentials = namedtuple("Credentials", ["username", "password"])
+RegistryData = namedtuple("RegistryData", ["hostname",
+                                           "username",
+                                           "password",
+                                           "installer_image",
+                                           "rhua_image",
+                                           "cds_image",
+                                           "haproxy_image"])
+
+# read-only RHUI tools configuration sessions of connections, see RhuiToolsConfig.cached():
+# {connection: (modification time and size of the custom configuration file, RhuiToolsConfig)}
+_SESSIONS = weakref.WeakKeyDictionary()
+
+# parsed credentials files: {hostname: (modification time and size, ConfigParser)}
+_CREDENTIALS_CACHE = {}
+
+def _credentials_cfg(connection):
+    """return the parsed credentials file, reading it again only if it has changed"""
+    # the file is examined on the host, where it's cheaper than in the RHUA container;
+    # the modification time is taken with full resolution, so that a rewrite within a second
+    # is noticed, too
+    _, stdout, _ = connection.exec_command(f"stat -c '%y %s' {CREDS_HOST}")
+    stamp = stdout.read().decode().strip()
+    cached = _CREDENTIALS_CACHE.get(connection.hostname)
+    if stamp and cached and cached[0] == stamp:
+        return cached[1]
+    creds_cfg = ConfigParser()
+    _, stdout, _ = connection.exec_command(f"cat {CREDS_HOST}")
+    creds_cfg.read_string(stdout.read().decode())
+    if stamp:
+        _CREDENTIALS_CACHE[connection.hostname] = (stamp, creds_cfg)
+    return creds_cfg
+
+class RhuiToolsConfig():
+    """
+    A session with the RHUI tools configuration: the static and custom configuration files are
+    read at once, options are read from memory, changes are collected, and they're written
+    (with a backup of the original file) at once when the session is committed.
+    """
+    # use: cfg = RhuiToolsConfig(connection); cfg.get(...); cfg.set(...); ...; cfg.commit()
+    # or, just to read options: RhuiToolsConfig.cached(connection).get(...)
+    @staticmethod
+    def cached(connection):
+        """return the session kept for reading options on the connection"""
+        # the session is reused only while the custom configuration file stays the same, so
+        # changes made by other means (rhui-manager, commands run by tests, manual edits)
+        # are noticed, too; the static file only changes when the installer is rerun,
+        # which drops all the sessions
+        _, stdout, _ = connection.exec_command(f"stat -c '%y %s' {RHUI_CFG_HOST}")
+        stamp = stdout.read().decode().strip()
+        cached = _SESSIONS.get(connection)
+        if stamp and cached and cached[0] == stamp:
+            return cached[1]
+        # the kept session refers to the connection weakly, or the connection would never be freed
+        session = RhuiToolsConfig(weakref.proxy(connection))
+        if stamp:
+            _SESSIONS[connection] = (stamp, session)
+        return session
+
+    @staticmethod
+    def invalidate(connection=None):
+        """drop the session kept for the connection, or all kept sessions"""
+        if connection is None:
+            _SESSIONS.clear()
+        else:
+            _SESSIONS.pop(connection, None)
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.custom = ConfigParser()
+        self.changed = False
+        self._static_text = ""
+        self._merged = None
+        self.load()
+
+    def load(self):
+        """(re)read the configuration files, discarding any uncommitted changes"""
+        _, stdout, _ = self.connection.exec_command(f"rhua cat {RHUI_CFG_STATIC} && " +
+                                                    f"echo && echo '{SESSION_SEPARATOR}' && " +
+                                                    f"cat {RHUI_CFG_HOST}")
+        static_text, separator, custom_text = stdout.read().decode().partition(SESSION_SEPARATOR)
+        # never go on without the files, or the next commit would wipe the custom configuration
+        if not separator or stdout.channel.recv_exit_status():
+            raise RuntimeError(f"could not read {RHUI_CFG_STATIC} and {RHUI_CFG_HOST}")
+        self._static_text = static_text
+        self.custom = ConfigParser()
+        self.custom.read_string(custom_text)
+        self._merged = None
+        self.changed = False
+
+    def _custom_text(self):
+        """return the custom configuration as text"""
+        text = io.StringIO()
+        self.custom.write(text)
+        return text.getvalue()
+
+    def get(self, section, option, **kwargs):
+        """get the value of the option, with any uncommitted changes applied"""
+        # raises standard configparser exceptions on failures; kwargs: passed to ConfigParser.get
+        if self._merged is None:
+            self._merged = ConfigParser()
+            self._merged.read_string(self._static_text)
+            self._merged.read_string(self._custom_text())
+        return self._merged.get(section, option, **kwargs)
+
+    def set(self, section, option, value):
+        """set the option in the custom configuration"""
+        if not self.custom.has_section(section):
+            self.custom.add_section(section)
+        self.custom.set(section, option, value)
+        self._merged = None
+        self.changed = True
+
+    def remove(self, section, option):
+        """remove the option from the custom configuration, if it's there"""
+        if self.custom.has_section(section) and self.custom.remove_option(section, option):
+            self._merged = None
+            self.changed = True
+
+    def commit(self, backup=True):
+        """write the changes to the custom configuration file; return True if there were any"""
+        if not self.changed:
+            return False
+        # the new content is transferred to a temporary file next to the configuration file
+        # first, and that then replaces the configuration file at once, so the file is never
+        # left incomplete; the directory, not the file, is mounted in the RHUA container,
+        # so the file can be replaced (just like sed -i does in edit_rhui_tools_conf)
+        cmd = f"f=$(echo {RHUI_CFG_HOST}) && "
+        if backup:
+            cmd += f"cp -a $f {RHUI_CFG_HOST_BAK_DIR}/rhui-tools.bak && "
+        cmd += "cat > $f.new && mv -f $f.new $f"
+        stdin, stdout, stderr = self.connection.exec_command(cmd)
+        stdin.write(self._custom_text())
+        stdin.channel.shutdown_write()
+        RhuiToolsConfig.invalidate(self.connection)
+        if stdout.channel.recv_exit_status():
+            raise RuntimeError(f"could not write {RHUI_CFG_HOST}: {stderr.read().decode()}")
+        self.changed = False
+        return True
+
 class Config():
     """reading from and writing to RHUI configuration files"""
     @staticmethod
     def get_credentials(connection, site="rh"):
         """get the user name and password for the given site from the RHUA"""
-        creds_cfg = ConfigParser()
-        _, stdout, _ = connection.exec_command(f"rhua cat {CREDS}")
-        creds_cfg.read_file(stdout)
+        creds_cfg = _credentials_cfg(connection)
         if not creds_cfg.has_section(site):
             raise RuntimeError(f"section {site} does not exist in {CREDS}")
         if not creds_cfg.has_option(site, "username"):
             raise RuntimeError(f"username does not exist inside {site} in {CREDS}")
         if not creds_cfg.has_option(site, "password"):
             raise RuntimeError(f"password does not exist inside {site} in {CREDS}")
-        credentials = [creds_cfg.get(site, "username"), creds_cfg.get(site, "password")]
-        return credentials
+        return Credentials(creds_cfg.get(site, "username"), creds_cfg.get(site, "password"))
 
     @staticmethod
     def get_registry_data(connection):
         """get the RHUI container image registry hostname and credentials"""
-        creds_cfg = ConfigParser()
-        _, stdout, _ = connection.exec_command(f"rhua cat {CREDS}")
-        creds_cfg.read_file(stdout)
+        creds_cfg = _credentials_cfg(connection)
         if not creds_cfg.has_section("registry"):
             if not creds_cfg.has_section("rh"):
                 raise RuntimeError(f"neither a 'registry' nor an 'rh' section exists in {CREDS}")
@@ -46,28 +187,22 @@ class Config():
             section = "registry"
             if not creds_cfg.has_option(section, "hostname"):
                 raise RuntimeError(f"hostname does not exist inside 'registry' in {CREDS}")
-        credentials = [OFFICIAL_REGISTRY if section == "rh" else creds_cfg.get(section,
-                                                                               "hostname"),
-                       creds_cfg.get(section, "username", fallback=""),
-                       creds_cfg.get(section, "password", fallback=""),
-                       creds_cfg.get(section,
-                                     "installer_image",
-                                     fallback="rhui5/installer-rhel9"),
-                       creds_cfg.get(section, "rhua_image", fallback=""),
-                       creds_cfg.get(section, "cds_image", fallback=""),
-                       creds_cfg.get(section, "haproxy_image", fallback="")]
-        return credentials
+        return RegistryData(OFFICIAL_REGISTRY if section == "rh" else creds_cfg.get(section,
+                                                                                    "hostname"),
+                            creds_cfg.get(section, "username", fallback=""),
+                            creds_cfg.get(section, "password", fallback=""),
+                            creds_cfg.get(section,
+                                          "installer_image",
+                                          fallback="rhui5/installer-rhel9"),
+                            creds_cfg.get(section, "rhua_image", fallback=""),
+                            creds_cfg.get(section, "cds_image", fallback=""),
+                            creds_cfg.get(section, "haproxy_image", fallback=""))
 
     @staticmethod
     def get_from_rhui_tools_conf(connection, section, option):
         """get the value of the given option from the given section in RHUI configuration"""
         # raises standard configparser exceptions on failures
-        rhuicfg = ConfigParser()
-        _, stdout, _ = connection.exec_command(f"rhua cat {RHUI_CFG_STATIC}")
-        rhuicfg.read_file(stdout)
-        _, stdout, _ = connection.exec_command(f"rhua cat {RHUI_CFG_CUSTOM}")
-        rhuicfg.read_file(stdout)
-        return rhuicfg.get(section, option)
+        return RhuiToolsConfig.cached(connection).get(section, option)
 
     @staticmethod
     def get_registry_url(site, connection=""):
@@ -87,12 +222,7 @@ class Config():
         # if "site" isn't in credentials.conf, then "data" is supposed to be:
         # [username, password, url], or just [url] if no authentication is to be used for "site";
         # first get the RHUI config file
-        rhuicfg = ConfigParser()
-        _, stdout, _ = connection.exec_command(f"rhua cat {RHUI_CFG_CUSTOM}")
-        rhuicfg.read_file(stdout)
-        # add the relevant config section if it's not there yet
-        if not rhuicfg.has_section("container"):
-            rhuicfg.add_section("container")
+        rhuicfg = RhuiToolsConfig(connection)
         # then get the credentials
         try:
             credentials = Config.get_credentials(connection, site)
@@ -117,30 +247,18 @@ class Config():
             rhuicfg.set("container", "registry_password", credentials[1])
         # otherwise, make sure the options don't exists in the configuration
         else:
-            rhuicfg.remove_option("container", "registry_username")
-            rhuicfg.remove_option("container", "registry_password")
-        # back up the original config file (unless prevented)
-        if backup:
-            Config.backup_rhui_tools_conf(connection)
-        # save (rewrite) the configuration file with the newly added credentials
-        stdin, _, _ = connection.exec_command(f"cat > {RHUI_CFG_HOST}")
-        rhuicfg.write(stdin)
+            rhuicfg.remove("container", "registry_username")
+            rhuicfg.remove("container", "registry_password")
+        # save the configuration file with the newly added credentials,
+        # backing up the original config file (unless prevented)
+        rhuicfg.commit(backup)
 
     @staticmethod
     def set_rhui_tools_conf(connection, section, option, value, backup=True):
         """set a configuration option in the RHUI tools configuration file"""
-        rhuicfg = ConfigParser()
-        _, stdout, _ = connection.exec_command(f"cat {RHUI_CFG_HOST}")
-        rhuicfg.read_file(stdout)
-        if section not in rhuicfg.sections():
-            rhuicfg.add_section(section)
+        rhuicfg = RhuiToolsConfig(connection)
         rhuicfg.set(section, option, value)
-        # back up the original config file (unless prevented)
-        if backup:
-            Config.backup_rhui_tools_conf(connection)
-        # save (rewrite) the configuration file
-        stdin, _, _ = connection.exec_command(f"cat > {RHUI_CFG_HOST}")
-        rhuicfg.write(stdin)
+        rhuicfg.commit(backup)
 
     @staticmethod
     def set_sync_policy(connection,
@@ -149,30 +267,21 @@ class Config():
                         on_demand_repoid_regex="",
                         backup=True):
         """set the default sync policy or policy regexes"""
+        # any combination of the settings can be changed at once
+        if not default_sync_policy and not immediate_repoid_regex and not on_demand_repoid_regex:
+            raise ValueError("Must set the default policy or a regex.")
         # validate the input if setting the default policy
         if default_sync_policy:
             types = {"immediate", "on_demand"}
             if default_sync_policy not in types:
                 raise ValueError(f"Unsupported type: '{default_sync_policy}'. Use one of: {types}.")
-            Config.set_rhui_tools_conf(connection,
-                                       "rhui",
-                                       "default_sync_policy",
-                                       default_sync_policy,
-                                       backup=backup)
-        elif immediate_repoid_regex:
-            Config.set_rhui_tools_conf(connection,
-                                       "rhui",
-                                       "immediate_repoid_regex",
-                                       immediate_repoid_regex,
-                                       backup=backup)
-        elif on_demand_repoid_regex:
-            Config.set_rhui_tools_conf(connection,
-                                       "rhui",
-                                       "on_demand_repoid_regex",
-                                       on_demand_repoid_regex,
-                                       backup=backup)
-        else:
-            raise ValueError("Must set the default policy or a regex.")
+        rhuicfg = RhuiToolsConfig(connection)
+        for option, value in [("default_sync_policy", default_sync_policy),
+                              ("immediate_repoid_regex", immediate_repoid_regex),
+                              ("on_demand_repoid_regex", on_demand_repoid_regex)]:
+            if value:
+                rhuicfg.set("rhui", option, value)
+        rhuicfg.commit(backup)
 
     @staticmethod
     def backup_rhui_tools_conf(connection):
@@ -187,10 +296,12 @@ class Config():
         if backup:
             cmd += ".bak"
         cmd = f"{cmd} 's/^{opt}.*/{opt}: {val}/' {RHUI_CFG_CUSTOM}"
+        RhuiToolsConfig.invalidate(connection)
         Expect.expect_retval(connection, cmd)
 
     @staticmethod
     def restore_rhui_tools_conf(connection):
         """restore the backup copy of the RHUI tools configuration file"""
+        RhuiToolsConfig.invalidate(connection)
         Expect.expect_retval(connection,
                              f"mv -f {RHUI_CFG_HOST_BAK_DIR}/rhui-tools.bak {RHUI_CFG_HOST}")
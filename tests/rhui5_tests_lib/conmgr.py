@@ -6,6 +6,8 @@ import logging
 from stitches.connection import Connection
 from stitches.expect import Expect
 
+from rhui5_tests_lib import standin
+
 SHORT_HOSTNAMES = {"RHUA": "rhua",
                    "NFS": "nfs",
                    "LB": "lb",
@@ -72,6 +74,10 @@ class ConMgr():
     @staticmethod
     def connect(hostname="", username=USER_NAME, sshkey=USER_KEY):
         """create a connection to the specified host"""
+        # with RHUI_STANDIN set, all connections lead to the offline stand-in (see standin.py)
+        if standin.enabled():
+            return standin.StandInConnection(hostname or ConMgr.get_rhua_hostname(),
+                                             standin.get_standin())
         return Connection(hostname or ConMgr.get_rhua_hostname(), username, sshkey)
 
     @staticmethod
@@ -1,13 +1,60 @@
 """Helper Functions for RHUI Test Cases"""
 
+from concurrent.futures import ThreadPoolExecutor
 from os.path import basename
 import time
+import weakref
 
 from stitches.expect import Expect
 import nose
 import yaml
 
-from rhui5_tests_lib.cfg import Config, LEGACY_CA_DIR, RHUI_ROOT
+from rhui5_tests_lib.cfg import Config, LEGACY_CA_DIR, RHUI_CFG_HOST_BAK_DIR, RHUI_ROOT
+from rhui5_tests_lib.manifest import Manifest
+from rhui5_tests_lib.pulp_api import CONTENT_TYPES, PulpAPI
+from rhui5_tests_lib.repodata import RepodataCache
+
+RHUI_SERVICES = {"rhua": ["nginx",
+                          "pulpcore-api",
+                          "pulpcore-content",
+                          "pulpcore-worker@*"],
+                 "cds": ["nginx",
+                         "gunicorn-auth",
+                         "gunicorn-content_manager",
+                         "gunicorn-mirror"],
+                 "ha": ["haproxy"]}
+
+# the RHUI node types of connections, see Helpers.node_role()
+_NODE_ROLES = weakref.WeakKeyDictionary()
+
+def _restart_services(connection):
+    """run the restart script on the host; return the role, duration, and PIDs"""
+    fun = Helpers.node_role(connection)
+    get_pids_cmd = f"{fun} systemctl -p MainPID show %s | awk -F = '/PID/ {{ print $2 }}'"
+    # fetch the current PIDs
+    _, stdout, _ = connection.exec_command(get_pids_cmd % " ".join(RHUI_SERVICES[fun]))
+    oldpids = list(map(int, stdout.read().decode().splitlines()))
+    # actually run the restart script, should exit with 0
+    start = time.time()
+    Expect.expect_retval(connection, f"{fun} rhui-services-restart", timeout=60)
+    seconds = time.time() - start
+    # fetch PIDs again
+    _, stdout, _ = connection.exec_command(get_pids_cmd % " ".join(RHUI_SERVICES[fun]))
+    newpids = list(map(int, stdout.read().decode().splitlines()))
+    return {"role": fun, "seconds": seconds, "old_pids": oldpids, "new_pids": newpids}
+
+def _check_restart(result, hostname=""):
+    """check if all the services were running and have been restarted"""
+    prefix = f"{hostname}: " if hostname else ""
+    oldpids, newpids = result["old_pids"], result["new_pids"]
+    # 0 in the output means the service is down (or doesn't exist)
+    nose.tools.ok_(0 not in oldpids, msg=f"{prefix}an inactive (or unknown) service was detected")
+    # the number of PIDs should remain the same
+    nose.tools.eq_(len(oldpids), len(newpids), msg=f"{prefix}{oldpids} -> {newpids}")
+    # none of the new PIDs should be among the old PIDs; that would mean the service
+    # wasn't restarted
+    for pid in newpids:
+        nose.tools.ok_(pid not in oldpids, msg=f"{prefix}{pid} remained running")
 
 class Helpers():
     """actions that may be repeated in specific test cases and do not belong in general utils"""
@@ -47,52 +94,46 @@ class Helpers():
         """return True if the remote host is registered with RHSM, or False otherwise"""
         return connection.recv_exit_status("subscription-manager identity") == 0
 
+    @staticmethod
+    def node_role(connection):
+        """return the type of the RHUI node: rhua, cds, or ha (the name of its command wrapper)"""
+        # the wrappers are probed in one command, and the result is remembered for the connection
+        role = _NODE_ROLES.get(connection)
+        if role:
+            return role
+        probe = "for fun in " + " ".join(RHUI_SERVICES) + "; " + \
+                "do if [ -n \"$($fun -h 2> /dev/null)\" ]; then echo $fun; break; fi; done"
+        _, stdout, _ = connection.exec_command(probe)
+        role = stdout.read().decode().strip()
+        if role not in RHUI_SERVICES:
+            raise ValueError("Unknown RHUI node type") from None
+        _NODE_ROLES[connection] = role
+        return role
+
     @staticmethod
     def restart_rhui_services(connection):
         """restart RHUI services on the remote host (according to the determined type)"""
-        services = {
-                    "rhua":    [
-                                "nginx",
-                                "pulpcore-api",
-                                "pulpcore-content",
-                                "pulpcore-worker@*"
-                               ],
-                    "cds":     [
-                                "nginx",
-                                "gunicorn-auth",
-                                "gunicorn-content_manager",
-                                "gunicorn-mirror"
-                               ],
-                    "ha": [
-                                "haproxy"
-                               ]
-                   }
-        fun = None
-        for helper_function in services:
-            _, stdout, _ = connection.exec_command(f"{helper_function} -h")
-            output = stdout.read().decode().strip()
-            if output:
-                fun = helper_function
-                break
-        if not fun:
-            raise ValueError("Unknown RHUI node type") from None
-        get_pids_cmd = f"{fun} systemctl -p MainPID show %s | awk -F = '/PID/ {{ print $2 }}'"
-        # fetch the current PIDs
-        _, stdout, _ = connection.exec_command(get_pids_cmd % " ".join(services[fun]))
-        oldpids = list(map(int, stdout.read().decode().splitlines()))
-        # actually run the restart script, should exit with 0
-        Expect.expect_retval(connection, f"{fun} rhui-services-restart", timeout=60)
-        # fetch PIDs again
-        _, stdout, _ = connection.exec_command(get_pids_cmd % " ".join(services[fun]))
-        newpids = list(map(int, stdout.read().decode().splitlines()))
-        # 0 in the output means the service is down (or doesn't exist)
-        nose.tools.ok_(0 not in oldpids, msg="an inactive (or unknown) service was detected")
-        # the number of PIDs should remain the same
-        nose.tools.eq_(len(oldpids), len(newpids))
-        # none of the new PIDs should be among the old PIDs; that would mean the service
-        # wasn't restarted
-        for pid in newpids:
-            nose.tools.ok_(pid not in oldpids, msg=f"{pid} remained running")
+        _check_restart(_restart_services(connection))
+
+    @staticmethod
+    def restart_rhui_services_fleet(connections, rolling=False):
+        """restart RHUI services on all the given hosts; return the durations and PIDs"""
+        # the hosts are restarted at once, or one after another if "rolling" is True, in which
+        # case each host is checked before the next one is restarted; the result is a dict
+        # with the hostnames as keys and dicts with the role, seconds, old and new PIDs as values
+        results = {}
+        if rolling:
+            for connection in connections:
+                results[connection.hostname] = _restart_services(connection)
+                _check_restart(results[connection.hostname], connection.hostname)
+            return results
+        with ThreadPoolExecutor(len(connections) or 1) as executor:
+            futures = {connection.hostname: executor.submit(_restart_services, connection)
+                       for connection in connections}
+            results = {hostname: future.result() for hostname, future in futures.items()}
+        for hostname, result in results.items():
+            _check_restart(result, hostname)
+        return results
 
     @staticmethod
     def add_legacy_ca(connection, local_ca_file):
@@ -142,19 +183,13 @@ class Helpers():
     def get_artifacts(connection):
         """return a list of all artifacts"""
         basedir = f"{RHUI_ROOT}/pulp3/artifact/"
-        _, stdout, _ = connection.exec_command(f"find {basedir} -type f")
-        artifacts_full_paths = stdout.read().decode().splitlines()
-        artifacts = [artifact.replace(basedir, "") for artifact in artifacts_full_paths]
-        return artifacts
+        return list(Manifest.paths(Manifest.stream(connection, basedir, "f")))
 
     @staticmethod
     def get_symlinks(connection):
         """return a list of all symlinks to artifacts"""
         basedir = f"{RHUI_ROOT}/symlinks/pulp/content/"
-        _, stdout, _ = connection.exec_command(f"find {basedir} -type l")
-        symlinks_full_paths = stdout.read().decode().splitlines()
-        symlinks = [symlink.replace(basedir, "") for symlink in symlinks_full_paths]
-        return symlinks
+        return list(Manifest.paths(Manifest.stream(connection, basedir, "l")))
 
     @staticmethod
     def clear_symlinks(connection):
@@ -162,6 +197,41 @@ class Helpers():
         Expect.expect_retval(connection, f"rm -rf {RHUI_ROOT}/symlinks/pulp")
         time.sleep(7)
 
+    @staticmethod
+    def reset_rhua(connection, baseline_repo_ids=None):
+        """bring the RHUA content back to a baseline: no repos but the given ones, no leftovers"""
+        # this is a bulk alternative to deleting repos and their stuff one by one in rhui-manager,
+        # handy after a crashed test module; it's safe to run it repeatedly
+        keep = set(baseline_repo_ids or [])
+        RepodataCache.invalidate()
+        fields = ["pulp_href", "name"]
+        hrefs = []
+        for content_type in CONTENT_TYPES:
+            repos = PulpAPI.list_all_repos(connection, content_type, fields)
+            kept_repo_hrefs = {repo["pulp_href"] for repo in repos if repo["name"] in keep}
+            distributions = PulpAPI.list_distributions(connection,
+                                                       content_type,
+                                                       fields + ["repository"])
+            hrefs += [dist["pulp_href"] for dist in distributions
+                      if dist["name"] not in keep and dist["repository"] not in kept_repo_hrefs]
+            hrefs += [repo["pulp_href"] for repo in repos if repo["name"] not in keep]
+            remotes = PulpAPI.list_remotes(connection, content_type, fields)
+            hrefs += [remote["pulp_href"] for remote in remotes if remote["name"] not in keep]
+        if hrefs:
+            task_hrefs = PulpAPI.delete_hrefs(connection, hrefs)
+            PulpAPI.wait_for_tasks(connection, task_hrefs=task_hrefs)
+        # one orphan cleanup takes care of all the content left behind by the deleted repos
+        PulpAPI.delete_orphans(connection)
+        PulpAPI.wait_for_tasks(connection)
+        # the symlinks are recreated by exporting the repos, so re-export the kept ones
+        Helpers.clear_symlinks(connection)
+        for repo_id in sorted(keep):
+            Expect.expect_retval(connection, f"rhua rhui-manager repo export --repo_id {repo_id}")
+        # restore the RHUI configuration if a test module left a backup copy behind
+        backup = f"{RHUI_CFG_HOST_BAK_DIR}/rhui-tools.bak"
+        if connection.recv_exit_status(f"test -f {backup}") == 0:
+            Config.restore_rhui_tools_conf(connection)
+
     @staticmethod
     def auth_exists(connection):
         """check if the container auth file exists (on the RHUA)"""
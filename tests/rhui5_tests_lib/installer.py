@@ -2,8 +2,9 @@
 
 from stitches.expect import Expect
 
-from rhui5_tests_lib.cfg import Config
+from rhui5_tests_lib.cfg import Config, RhuiToolsConfig
 from rhui5_tests_lib.conmgr import ConMgr, SUDO_USER_NAME
+from rhui5_tests_lib.inventory import InstanceInventory
 
 class RHUIInstaller():
     """The rhui-installer command-line interface"""
@@ -17,9 +18,9 @@ class RHUIInstaller():
         rhua = ConMgr.connect()
         launchpad = ConMgr.connect(ConMgr.get_launchpad_hostname())
         registry_data = Config.get_registry_data(rhua)
-        registry = registry_data[0]
-        default_installer_image = registry_data[3]
-        default_rhua_image = registry_data[4]
+        registry = registry_data.hostname
+        default_installer_image = registry_data.installer_image
+        default_rhua_image = registry_data.rhua_image
         cmd = f"cd /tmp ; sudo -u {SUDO_USER_NAME} " \
               f"podman run --rm " \
               f"-v /home/{SUDO_USER_NAME}/.ssh/id_ecdsa_launchpad:/ssh-keyfile:Z"
@@ -43,6 +44,8 @@ class RHUIInstaller():
               f"--target-host {ConMgr.get_rhua_hostname()} " \
               f"--target-user {SUDO_USER_NAME} " \
               f"--rerun {other_args}"
+        InstanceInventory.invalidate()
+        RhuiToolsConfig.invalidate()
         Expect.expect_retval(launchpad, cmd, 2 if expect_trouble else 0, 300)
 
     @staticmethod
@@ -50,9 +53,10 @@ class RHUIInstaller():
         """Get help (the usage message) from the installer"""
         rhua = ConMgr.connect()
         launchpad = ConMgr.connect(ConMgr.get_launchpad_hostname())
-        registry, _, _, installer_image, _, _, _ = Config.get_registry_data(rhua)
+        registry_data = Config.get_registry_data(rhua)
         cmd = f"cd /tmp ; sudo -u {SUDO_USER_NAME} " \
-              f"podman run --rm {registry}/{installer_image} rhui-installer --help"
+              f"podman run --rm {registry_data.hostname}/{registry_data.installer_image} " \
+              f"rhui-installer --help"
         _, stdout, _ = launchpad.exec_command(cmd)
         output = stdout.read().decode()
         return output
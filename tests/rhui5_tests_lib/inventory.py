@@ -0,0 +1,30 @@
+"""Inventory of the CDS and HAProxy Nodes Tracked by the RHUA"""
+
+# Listing the nodes takes a rhui-manager run (or a TUI session), and tests often only need
+# to know if some nodes have been added. The inventory remembers the lists of nodes, keyed by
+# the RHUA hostname and the node type ("cds" or "haproxy"). Every listing through the library
+# refreshes the inventory, and every function in the library that adds, reinstalls, or deletes
+# nodes, or reruns the installer, invalidates it. Nodes changed by other means aren't noticed,
+# so use RHUIManagerCLIInstance.list() rather than the inventory when testing the listing itself.
+
+_INVENTORY = {}
+
+class InstanceInventory():
+    """remember the nodes tracked by the RHUA"""
+    @staticmethod
+    def get(connection, node_type):
+        """return the remembered list of nodes of the given type, or None"""
+        nodes = _INVENTORY.get((connection.hostname, node_type))
+        return None if nodes is None else list(nodes)
+
+    @staticmethod
+    def store(connection, node_type, nodes):
+        """remember the list of nodes of the given type"""
+        _INVENTORY[(connection.hostname, node_type)] = list(nodes)
+
+    @staticmethod
+    def invalidate(node_type=None):
+        """forget the nodes of the given type, or all nodes"""
+        for key in list(_INVENTORY):
+            if node_type is None or key[1] == node_type:
+                _INVENTORY.pop(key, None)
@@ -0,0 +1,92 @@
+"""Manifests of Directory Trees on the RHUA"""
+
+# A manifest lists the files and/or symlinks in a tree with their size, mtime, inode, and
+# link target. It's made on the RHUA by an agent (see agents/manifest.py) and transferred
+# compressed; the entries are parsed one at a time as they arrive, so even trees with millions
+# of entries don't need much memory. A manifest can also be saved to a local file as is
+# and read later, e.g. to compare the state of a tree before and after an operation.
+# Manifests are sorted by path, so two of them are compared in a single pass.
+
+from collections import namedtuple
+import gzip
+import shutil
+
+from rhui5_tests_lib import agents
+
+ManifestEntry = namedtuple("ManifestEntry", ["path", "type", "size", "mtime", "inode", "target"])
+
+def _unescape(text):
+    """undo the escaping of separators done by the agent"""
+    if "\\" not in text:
+        return text
+    result = []
+    chars = iter(text)
+    for char in chars:
+        if char == "\\":
+            char = {"t": "\t", "n": "\n"}.get(next(chars, ""), "\\")
+        result.append(char)
+    return "".join(result)
+
+def _key(entry):
+    """return the key by which the entries in a manifest are sorted"""
+    return entry.path.split("/")
+
+def _parse(lines):
+    """yield manifest entries from lines of a (decompressed) manifest"""
+    for line in lines:
+        path, kind, size, mtime, inode, target = line.decode("utf-8", "surrogateescape") \
+                                                     .rstrip("\n").split("\t")
+        yield ManifestEntry(_unescape(path), kind, int(size), int(mtime), int(inode),
+                            _unescape(target))
+
+class Manifest():
+    """make, save, read, and compare manifests"""
+    @staticmethod
+    def stream(connection, root, types="fl"):
+        """yield the entries of the given types (f, l, d) in the tree on the RHUA"""
+        stdout, stderr = agents.start(connection, "manifest", ["--types", types, root])
+        with gzip.GzipFile(fileobj=stdout) as manifest:
+            yield from _parse(manifest)
+        agents.check("manifest", stdout, stderr)
+
+    @staticmethod
+    def save(connection, root, local_file, types="fl"):
+        """save the (compressed) manifest of the tree on the RHUA to a local file"""
+        stdout, stderr = agents.start(connection, "manifest", ["--types", types, root])
+        with open(local_file, "wb") as manifest:
+            shutil.copyfileobj(stdout, manifest)
+        agents.check("manifest", stdout, stderr)
+
+    @staticmethod
+    def read(local_file):
+        """yield the entries of a saved manifest"""
+        with gzip.open(local_file) as manifest:
+            yield from _parse(manifest)
+
+    @staticmethod
+    def paths(entries):
+        """yield just the paths of the entries"""
+        for entry in entries:
+            yield entry.path
+
+    @staticmethod
+    def diff(old_entries, new_entries, compare=("type", "size", "mtime", "inode", "target")):
+        """yield (change, old entry, new entry) for entries that differ between two manifests"""
+        # change is "removed" (new entry is None), "added" (old entry is None), or "changed",
+        # which means that at least one of the attributes to compare differs
+        old_entries = iter(old_entries)
+        new_entries = iter(new_entries)
+        old = next(old_entries, None)
+        new = next(new_entries, None)
+        while old is not None or new is not None:
+            if new is None or (old is not None and _key(old) < _key(new)):
+                yield "removed", old, None
+                old = next(old_entries, None)
+            elif old is None or _key(new) < _key(old):
+                yield "added", None, new
+                new = next(new_entries, None)
+            else:
+                if any(getattr(old, field) != getattr(new, field) for field in compare):
+                    yield "changed", old, new
+                old = next(old_entries, None)
+                new = next(new_entries, None)
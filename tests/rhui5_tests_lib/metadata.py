@@ -0,0 +1,165 @@
+"""Streaming Parsers for Repository Metadata"""
+
+# Repodata files of real RHEL repos are huge, so they are read from the RHUA as a stream,
+# decompressed on the fly, and parsed incrementally; the functions here yield one package,
+# group, or advisory at a time and drop each parsed element right away, so the memory usage
+# doesn't depend on the size of the file.
+# The compression is detected by the magic bytes at the beginning of the stream;
+# zstd is decompressed locally if the zstandard module is available, otherwise on the RHUA.
+
+import bz2
+import gzip
+import io
+import lzma
+import xml.etree.ElementTree as ET
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+MAGIC = {b"\x1f\x8b": "gz",
+         b"\xfd7zXZ\x00": "xz",
+         b"BZh": "bz2",
+         b"\x28\xb5\x2f\xfd": "zst"}
+
+class _RemoteStream(io.RawIOBase):
+    """raw, read-only stream over the stdout of a remote command, with the first bytes peeked"""
+    def __init__(self, stdout, peeked=b""):
+        super().__init__()
+        self._stdout = stdout
+        self._peeked = peeked
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._peeked:
+            data, self._peeked = self._peeked[:len(buffer)], self._peeked[len(buffer):]
+        else:
+            data = self._stdout.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _compression(head):
+    """return the compression format detected from the first bytes of a file, or None"""
+    for magic, compression in MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+def open_remote(connection, path):
+    """return a binary file-like object with the decompressed contents of the file on the host"""
+    _, stdout, _ = connection.exec_command(f"cat {path}")
+    head = stdout.read(6)
+    stream = io.BufferedReader(_RemoteStream(stdout, head), CHUNK_SIZE)
+    compression = _compression(head)
+    if compression == "gz":
+        return gzip.GzipFile(fileobj=stream)
+    if compression == "xz":
+        return lzma.LZMAFile(stream)
+    if compression == "bz2":
+        return bz2.BZ2File(stream)
+    if compression == "zst":
+        if zstandard:
+            return zstandard.ZstdDecompressor().stream_reader(stream)
+        stream.close()
+        _, stdout, _ = connection.exec_command(f"zstd -dc {path}")
+        return io.BufferedReader(_RemoteStream(stdout), CHUNK_SIZE)
+    return stream
+
+def _local(tag):
+    """return the tag name without the namespace"""
+    return tag.rsplit("}", 1)[-1]
+
+def _iter_elements(stream, tags):
+    """yield complete elements with the given (local) tag names, freeing them afterwards"""
+    root = None
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = elem
+        if event == "end" and _local(elem.tag) in tags:
+            yield elem
+            elem.clear()
+            # the root would still hold a reference to every (empty) element
+            root.clear()
+
+def _children(elem, tag):
+    """return the child elements with the given (local) tag name"""
+    return [child for child in elem if _local(child.tag) == tag]
+
+def _child_text(elem, tag, default=""):
+    """return the text of the first child element with the given tag name"""
+    for child in elem:
+        if _local(child.tag) == tag:
+            return (child.text or "").strip()
+    return default
+
+def _evr(elem):
+    """return the epoch, version, release of a package element"""
+    version = _children(elem, "version")
+    if not version:
+        return "", "", ""
+    return version[0].get("epoch", ""), version[0].get("ver", ""), version[0].get("rel", "")
+
+def repomd(stream):
+    """yield (data type, location) tuples from a repomd.xml stream"""
+    for elem in _iter_elements(stream, {"data"}):
+        location = _children(elem, "location")
+        yield elem.get("type"), location[0].get("href") if location else None
+
+def packages(stream):
+    """yield dicts describing packages from a primary.xml stream"""
+    for elem in _iter_elements(stream, {"package"}):
+        epoch, version, release = _evr(elem)
+        location = _children(elem, "location")
+        yield {"name": _child_text(elem, "name"),
+               "arch": _child_text(elem, "arch"),
+               "epoch": epoch,
+               "version": version,
+               "release": release,
+               "location": location[0].get("href") if location else ""}
+
+def package_files(stream):
+    """yield dicts describing packages and the files they contain from a filelists.xml stream"""
+    for elem in _iter_elements(stream, {"package"}):
+        epoch, version, release = _evr(elem)
+        yield {"name": elem.get("name"),
+               "arch": elem.get("arch"),
+               "epoch": epoch,
+               "version": version,
+               "release": release,
+               "files": [(child.text or "").strip() for child in _children(elem, "file")]}
+
+def advisories(stream):
+    """yield dicts describing advisories from an updateinfo.xml stream"""
+    for elem in _iter_elements(stream, {"update"}):
+        package_list = []
+        for pkglist in _children(elem, "pkglist"):
+            for collection in _children(pkglist, "collection"):
+                package_list += [_child_text(package, "filename")
+                                 for package in _children(collection, "package")]
+        yield {"id": _child_text(elem, "id"),
+               "type": elem.get("type", ""),
+               "title": _child_text(elem, "title"),
+               "severity": _child_text(elem, "severity"),
+               "packages": package_list}
+
+def groups(stream):
+    """yield dicts describing groups from a comps.xml stream"""
+    for elem in _iter_elements(stream, {"group"}):
+        # the untranslated name is the one without the xml:lang attribute
+        names = [name.text for name in _children(elem, "name") if not name.attrib]
+        package_list = []
+        for packagelist in _children(elem, "packagelist"):
+            package_list += [(req.text or "").strip() for req in packagelist]
+        yield {"id": _child_text(elem, "id"),
+               "name": names[0] if names else "",
+               "uservisible": _child_text(elem, "uservisible", "true").lower() == "true",
+               "packages": package_list}
+
+def langpacks(stream):
+    """yield (name, install) tuples from the langpacks section of a comps.xml stream"""
+    for elem in _iter_elements(stream, {"match"}):
+        yield elem.get("name"), elem.get("install")
@@ -0,0 +1,175 @@
+"""Preflight Checks of the RHUI Nodes and Clients"""
+
+# Problems with the nodes -- an unknown SSH host key, a broken sudo configuration, bad registry
+# credentials, a missing remote share, a skewed clock -- otherwise show up deep inside an Ansible
+# run, or make rhui-manager ask questions that the tests don't expect. Here, all the hosts
+# are checked at once, and the results are put together into one readiness report:
+# {"ready": True/False,
+#  "seconds": duration,
+#  "hosts": {hostname: {"role": "rhua"/"cds"/"haproxy"/"client",
+#                       "checks": {name: {"ok": True/False, "detail": text}, ...}},
+#            ...}}
+# The SSH host keys of the CDS and HAProxy nodes that the RHUA doesn't know yet are collected
+# in one pass, so adding the nodes never stops at the question whether to trust the key.
+
+from concurrent.futures import ThreadPoolExecutor
+import shlex
+import time
+
+from paramiko import SSHException
+from stitches.expect import ExpectFailed
+
+from rhui5_tests_lib.cfg import Config, RHUI_ROOT
+from rhui5_tests_lib.conmgr import ConMgr, SUDO_USER_NAME, SUDO_USER_KEY
+
+# the maximum difference between the clock of a node and the clock of the RHUA, in seconds
+MAX_CLOCK_SKEW = 5.0
+SSH_TIMEOUT = 10
+REGISTRY_AUTH_FILE = "/tmp/rhui-preflight-auth.json"
+# prints yes or no; "timedatectl show" needs systemd 239 or newer, so on older systems (RHEL 7),
+# the status is taken from "timedatectl status" or, failing that, from chrony
+NTP_STATUS_CMD = "{ timedatectl show -p NTPSynchronized --value 2> /dev/null || " + \
+                 "timedatectl status 2> /dev/null | " + \
+                 "sed -n 's/^ *\\(NTP\\|System clock\\) synchronized: *//p' | grep . || " + \
+                 "{ chronyc tracking 2> /dev/null | grep -q '^Leap status *: Normal' && " + \
+                 "echo yes; } || echo no; }"
+
+def _check(ok, detail=""):
+    """return the result of a check"""
+    return {"ok": ok, "detail": detail}
+
+def _clock(connection):
+    """return the offset of the host's clock from the local one, and the NTP status"""
+    # the time is read at some point between sending the command and getting the output
+    start = time.time()
+    _, stdout, _ = connection.exec_command(f"date +%s.%N; {NTP_STATUS_CMD}")
+    output = stdout.read().decode().split()
+    end = time.time()
+    if not output:
+        raise OSError("cannot read the clock")
+    return float(output[0]) - (start + end) / 2, output[1:] == ["yes"]
+
+def _unknown_hosts(rhua, hostnames):
+    """return the hostnames whose SSH keys the RHUA doesn't know"""
+    # rhui-manager considers a hostname unknown unless it's in lowercase in known_hosts
+    loop = "for host in " + " ".join(hostnames) + "; " + \
+           "do ssh-keygen -F $host > /dev/null || echo $host; done"
+    _, stdout, _ = rhua.exec_command(f"rhua sh -c {shlex.quote(loop)}")
+    unknown = set(stdout.read().decode().split())
+    return [hostname for hostname in hostnames if hostname in unknown or not hostname.islower()]
+
+def _check_mount(rhua):
+    """check if the remote share is mounted on the RHUA"""
+    _, stdout, _ = rhua.exec_command(f"findmnt -n -o SOURCE,FSTYPE --mountpoint {RHUI_ROOT}")
+    output = stdout.read().decode().strip()
+    if stdout.channel.recv_exit_status():
+        return _check(False, f"nothing is mounted in {RHUI_ROOT}")
+    return _check(True, output)
+
+def _check_registry(rhua):
+    """check if the RHUA can log in to the container registry with the known credentials"""
+    registry_data = Config.get_registry_data(rhua)
+    if not registry_data.username:
+        return _check(True, f"{registry_data.hostname}: no credentials to check")
+    # log in with a temporary auth file, so that the one rhui-manager uses is left alone
+    cmd = f"podman login --authfile {REGISTRY_AUTH_FILE} " + \
+          f"--username {shlex.quote(registry_data.username)} --password-stdin " + \
+          f"{registry_data.hostname}; status=$?; rm -f {REGISTRY_AUTH_FILE}; exit $status"
+    stdin, stdout, stderr = rhua.exec_command(cmd)
+    stdin.write(f"{registry_data.password}\n")
+    stdin.channel.shutdown_write()
+    if stdout.channel.recv_exit_status():
+        return _check(False, f"{registry_data.hostname}: {stderr.read().decode().strip()}")
+    return _check(True, f"{registry_data.hostname}: logged in as {registry_data.username}")
+
+def _check_sudo(rhua, hostname):
+    """check if the RHUA can log in to the node and use sudo, just like rhui-manager"""
+    cmd = f"rhua ssh -i {SUDO_USER_KEY} -o BatchMode=yes -o ConnectTimeout={SSH_TIMEOUT} " + \
+          f"{SUDO_USER_NAME}@{hostname} sudo -n true"
+    _, stdout, stderr = rhua.exec_command(cmd)
+    if stdout.channel.recv_exit_status():
+        return _check(False, stderr.read().decode().strip())
+    return _check(True, f"{SUDO_USER_NAME} can use sudo")
+
+def _check_host(hostname, role, rhua, known_hosts):
+    """run the checks that concern the host; return them with the host's clock offset"""
+    checks = {}
+    offset = None
+    connection = None
+    try:
+        connection = rhua if role == "rhua" else ConMgr.connect(hostname)
+        offset, synchronized = _clock(connection)
+        checks["ssh"] = _check(True)
+        checks["ntp"] = _check(synchronized,
+                               "synchronized" if synchronized else "not synchronized")
+    except (OSError, SSHException) as err:
+        checks["ssh"] = _check(False, str(err) or type(err).__name__)
+    finally:
+        if connection and connection is not rhua:
+            connection.disconnect()
+    if role == "rhua":
+        checks["remote_share"] = _check_mount(rhua)
+        checks["registry"] = _check_registry(rhua)
+    elif role in ("cds", "haproxy"):
+        checks["host_key"] = _check(hostname in known_hosts,
+                                    "known to the RHUA" if hostname in known_hosts
+                                    else "unknown to the RHUA (is the host reachable, " +
+                                    "and is the hostname in lowercase?)")
+        checks["sudo"] = _check_sudo(rhua, hostname)
+    return checks, offset
+
+class Preflight():
+    """check that the RHUI hosts are ready for the tests"""
+    @staticmethod
+    def run(rhua=None, cds=None, haproxy=None, clients=None,
+            keytype="rsa",
+            workers=8,
+            max_clock_skew=MAX_CLOCK_SKEW):
+        """check all the hosts at once; return the readiness report"""
+        # the default hosts are all the known ones; use an empty list to skip a role
+        start = time.time()
+        rhua = rhua or ConMgr.connect()
+        roles = {rhua.hostname: "rhua"}
+        for role, hostnames, default in [("cds", cds, ConMgr.get_cds_hostnames),
+                                         ("haproxy", haproxy, ConMgr.get_haproxy_hostnames),
+                                         ("client", clients, ConMgr.get_cli_hostnames)]:
+            for hostname in default(False) if hostnames is None else hostnames:
+                roles[hostname] = role
+        nodes = [hostname for hostname, role in roles.items() if role in ("cds", "haproxy")]
+        # collect the missing SSH host keys in one pass
+        known_hosts = set(nodes)
+        if nodes:
+            unknown = _unknown_hosts(rhua, nodes)
+            if unknown:
+                # ssh-keyscan fails if some hosts can't be reached, but it still saves the keys
+                # of the others; the unreachable ones are then reported as unknown
+                try:
+                    ConMgr.add_ssh_keys(rhua, [hostname.lower() for hostname in unknown], keytype)
+                except ExpectFailed:
+                    pass
+                known_hosts -= set(_unknown_hosts(rhua, unknown))
+        with ThreadPoolExecutor(max(min(workers, len(roles)), 1)) as executor:
+            futures = {hostname: executor.submit(_check_host, hostname, role, rhua, known_hosts)
+                       for hostname, role in roles.items()}
+            results = {hostname: future.result() for hostname, future in futures.items()}
+        # the clocks are compared with the one of the RHUA, which issues the certificates
+        rhua_offset = results[rhua.hostname][1]
+        for hostname, (checks, offset) in results.items():
+            if hostname == rhua.hostname or offset is None or rhua_offset is None:
+                continue
+            skew = offset - rhua_offset
+            checks["clock"] = _check(abs(skew) <= max_clock_skew,
+                                     f"{skew:+.1f} s from the RHUA")
+        hosts = {hostname: {"role": roles[hostname], "checks": checks}
+                 for hostname, (checks, _) in results.items()}
+        return {"ready": all(check["ok"] for host in hosts.values()
+                             for check in host["checks"].values()),
+                "seconds": time.time() - start,
+                "hosts": hosts}
+
+    @staticmethod
+    def problems(report):
+        """return a list of the failed checks in the report, as text"""
+        return [f"{hostname} ({host['role']}): {name}: {check['detail']}"
+                for hostname, host in report["hosts"].items()
+                for name, check in host["checks"].items() if not check["ok"]]
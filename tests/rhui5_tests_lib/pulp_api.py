@@ -1,17 +1,49 @@
 """ Functions to interact with the Pulp API """
 
 import shlex
+import time
 
 import json
 from stitches.expect import Expect
 
 from rhui5_tests_lib.util import Util
 
-def _get_api_base_cmd(connection):
+API_URL = "https://localhost"
+# printed by curl after each response in delete_hrefs, followed by the HTTP status and the URL
+STATUS_SEPARATOR = "@@@ HTTP status:"
+
+def _get_curl_cmd(connection, sudo=False):
+    """get the curl command with the credentials to access the API, but no URL"""
+    # sudo: use it if connected as a non-root user
+    admin_password = shlex.quote(Util.get_saved_password(connection, sudo=sudo))
+    return f"{'sudo -n ' if sudo else ''}rhua curl -k -u admin:{admin_password}"
+
+def _get_api_base_cmd(connection, sudo=False):
     """get the base command to access the API; you append the required Pulp href to it"""
-    admin_password = shlex.quote(Util.get_saved_password(connection))
-    rhua_hostname = "localhost"
-    return f"rhua curl -k -u admin:{admin_password} https://{rhua_hostname}"
+    return f"{_get_curl_cmd(connection, sudo)} {API_URL}"
+
+def _get_all_results(connection, href, fields=None, page_size=1000, sudo=False):
+    """follow the pagination of the given list endpoint and return all the results"""
+    # asking only for the fields that are needed keeps the responses small; the pages are
+    # followed via the "next" links that Pulp returns until there are no more
+    query = f"limit={page_size}"
+    if fields:
+        query += f"&fields={','.join(fields)}"
+    curl_cmd = _get_curl_cmd(connection, sudo)
+    results = []
+    url = f"{API_URL}{href}{'&' if '?' in href else '?'}{query}"
+    while url:
+        _, stdout, stderr = connection.exec_command(f"{curl_cmd} {shlex.quote(url)}")
+        try:
+            data = json.load(stdout)
+        except ValueError as err:
+            raise RuntimeError(f"cannot list {href}: {stderr.read().decode().strip()}") from err
+        results.extend(data["results"])
+        url = data.get("next")
+    return results
+
+# Pulp plugin types whose repositories, remotes and distributions RHUI manages
+CONTENT_TYPES = ["rpm/rpm", "container/container"]
 
 class PulpAPI():
     """ Pulp API functions """
@@ -56,6 +88,78 @@ class PulpAPI():
             return data["results"][0]
         raise RuntimeError(f"{repo} does not exist")
 
+    @staticmethod
+    def list_remotes(connection, content_type="rpm/rpm", fields=None):
+        """ return information about all remotes of the given type """
+        return _get_all_results(connection, f"/pulp/api/v3/remotes/{content_type}/", fields)
+
+    @staticmethod
+    def list_distributions(connection, content_type="rpm/rpm", fields=None, sudo=False):
+        """ return information about all distributions of the given type """
+        return _get_all_results(connection,
+                                f"/pulp/api/v3/distributions/{content_type}/",
+                                fields,
+                                sudo=sudo)
+
+    @staticmethod
+    def list_all_repos(connection, content_type="rpm/rpm", fields=None):
+        """ return information about all repos of the given type (not just the first page) """
+        return _get_all_results(connection, f"/pulp/api/v3/repositories/{content_type}/", fields)
+
+    @staticmethod
+    def delete_hrefs(connection, hrefs, chunk_size=100):
+        """ delete the given Pulp objects, using one curl call per chunk of hrefs """
+        # curl accepts any number of URLs and applies -X DELETE to each of them, but it exits
+        # with 0 even if Pulp refuses a deletion, so the HTTP status of each response is checked;
+        # returns the hrefs of the deletion tasks, which are to be waited for
+        curl_cmd = _get_curl_cmd(connection)
+        write_out = f"\\n{STATUS_SEPARATOR} %{{http_code}} %{{url_effective}}\\n"
+        task_hrefs = []
+        failures = []
+        for start in range(0, len(hrefs), chunk_size):
+            urls = " ".join(f"{API_URL}{href}" for href in hrefs[start:start + chunk_size])
+            _, stdout, stderr = connection.exec_command(f"{curl_cmd} -s -X DELETE " +
+                                                        f"-w '{write_out}' {urls}")
+            body = []
+            for line in stdout.read().decode().splitlines():
+                if not line.startswith(STATUS_SEPARATOR):
+                    body.append(line)
+                    continue
+                status, url = line[len(STATUS_SEPARATOR):].split()
+                response = "\n".join(body).strip()
+                body = []
+                if not status.startswith("2"):
+                    failures.append(f"{url[len(API_URL):]}: HTTP {status} {response}")
+                elif response:
+                    task = json.loads(response).get("task")
+                    if task:
+                        task_hrefs.append(task)
+            if stdout.channel.recv_exit_status():
+                raise RuntimeError(f"cannot delete Pulp objects: {stderr.read().decode().strip()}")
+        if failures:
+            raise RuntimeError("cannot delete Pulp objects: " + "; ".join(failures))
+        return task_hrefs
+
+    @staticmethod
+    def wait_for_tasks(connection, timeout=600, task_hrefs=None, chunk_size=100):
+        """ wait until there are no waiting or running tasks; check the given tasks succeeded """
+        for _ in range(0, timeout, 5):
+            if not PulpAPI.list_tasks(connection, ["waiting", "running"]):
+                break
+            time.sleep(5)
+        else:
+            raise RuntimeError(f"Pulp tasks still running after {timeout} seconds")
+        failed = []
+        for start in range(0, len(task_hrefs or []), chunk_size):
+            tasks_href = "/pulp/api/v3/tasks/?state__in=failed,canceled&pulp_href__in=" + \
+                         ",".join(task_hrefs[start:start + chunk_size])
+            failed += _get_all_results(connection, tasks_href, ["pulp_href", "state", "error"])
+        if failed:
+            raise RuntimeError("Pulp tasks did not succeed: " +
+                               "; ".join(f"{task['pulp_href']}: {task['state']} " +
+                                         f"({(task.get('error') or {}).get('description', '')})"
+                                         for task in failed))
+
     @staticmethod
     def list_tasks(connection, states=None):
         """ return information about tasks """
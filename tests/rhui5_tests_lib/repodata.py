@@ -0,0 +1,125 @@
+"""Cache and Verification of Repository Metadata on the RHUA"""
+
+# Looking up a repodata file requires a repo export, repo info, and reading repomd.xml.
+# That's slow, and checks typically look up several data types of the same repo in a row.
+# The cache remembers the relative path of each repo and the locations listed in its repomd.xml,
+# keyed by the SHA-256 checksum of that file; a changed checksum means a new revision
+# of the repodata, which is then read again.
+# Functions that change the content of a repo must invalidate the cached entry for it.
+# Every invalidation also increments a generation counter, which tells caches of data derived
+# from repo content (such as yum metadata on clients) that they may be outdated.
+
+import hashlib
+import io
+import json
+
+from rhui5_tests_lib import agents, metadata
+from rhui5_tests_lib.cfg import RHUI_ROOT
+from rhui5_tests_lib.pulp_api import PulpAPI
+
+_CACHE = {}
+_GENERATION = [0]
+
+class RepodataCache():
+    """remember repomd.xml data per repo and revision"""
+    @staticmethod
+    def get(repo):
+        """return the cached entry for the repo, or None"""
+        return _CACHE.get(repo)
+
+    @staticmethod
+    def store(repo, relative_path, repomd):
+        """parse the given repomd.xml contents (bytes) and store them for the repo"""
+        locations = dict(metadata.repomd(io.BytesIO(repomd)))
+        entry = {"relativepath": relative_path,
+                 "checksum": hashlib.sha256(repomd).hexdigest(),
+                 "locations": locations}
+        _CACHE[repo] = entry
+        return entry
+
+    @staticmethod
+    def is_current(connection, entry, repomd_file):
+        """check if the repomd.xml file on the RHUA still has the cached checksum"""
+        _, stdout, _ = connection.exec_command(f"sha256sum {repomd_file}")
+        output = stdout.read().decode().split()
+        return bool(output) and output[0] == entry["checksum"]
+
+    @staticmethod
+    def generation():
+        """return the number of invalidations so far"""
+        return _GENERATION[0]
+
+    @staticmethod
+    def invalidate(repo=None):
+        """forget the given repo, or all repos"""
+        # use the latter if the repo ID isn't known, e.g. when working with repo names in the TUI
+        _GENERATION[0] += 1
+        if repo is None:
+            _CACHE.clear()
+        else:
+            _CACHE.pop(repo, None)
+
+class RepodataVerifier():
+    """check exported repos on the remote share"""
+    # the checks run on the RHUA itself, see agents/verify_repo.py
+    @staticmethod
+    def relative_paths(connection, repo_ids=None, sudo=False):
+        """return a dict of repo IDs and relative paths of the given (or all) yum repos"""
+        # raises ValueError if any of the given repos doesn't exist
+        distributions = PulpAPI.list_distributions(connection,
+                                                   "rpm/rpm",
+                                                   ["name", "base_path"],
+                                                   sudo)
+        paths = {dist["name"]: dist["base_path"] for dist in distributions}
+        if repo_ids is None:
+            return paths
+        unknown = [repo_id for repo_id in repo_ids if repo_id not in paths]
+        if unknown:
+            raise ValueError(f"No such repo(s): {', '.join(unknown)}")
+        return {repo_id: paths[repo_id] for repo_id in repo_ids}
+
+    @staticmethod
+    def verify(connection, relative_paths, deep=False, workers=8, timeout=None, sudo=False):
+        """verify the exported repos with the given relative paths; return a list of results"""
+        # each result is a dict with the repo directory, the numbers of checked files and
+        # hashed bytes, and a list of errors (dicts with the path and the problem)
+        # with deep=True, all packages are hashed, not just the metadata files
+        content_dir = f"{RHUI_ROOT}/symlinks/pulp/content"
+        args = ["--workers", workers] + (["--deep"] if deep else [])
+        args += [f"{content_dir}/{relative_path}" for relative_path in relative_paths]
+        return agents.run(connection, "verify_repo", args, timeout, sudo)
+
+    @staticmethod
+    def check_symlinks(connection,
+                       deep=False,
+                       workers=8,
+                       budget=None,
+                       timeout=None,
+                       sudo=False,
+                       progress=None):
+        """check that the symlinks on the remote share point to intact artifacts"""
+        # return a dict with the numbers of symlinks and artifacts, problems with symlinks
+        # (dicts with the path and the problem: dangling, wrong target, etc.), and unreferenced
+        # artifacts, each also counted, and a flag saying whether everything has been checked;
+        # with deep=True, the checksums of the artifacts are verified, too;
+        # budget: the time in seconds after which the checks are to be stopped;
+        # progress: a function to call with a dict with the progress, for each finished shard
+        args = ["--workers", workers] + (["--deep"] if deep else [])
+        if budget:
+            args += ["--budget", budget]
+        args += [f"{RHUI_ROOT}/symlinks/pulp/content", f"{RHUI_ROOT}/pulp3/artifact"]
+        stdout, stderr = agents.start(connection, "check_symlinks", args, timeout, sudo)
+        errors = []
+        for line in stderr:
+            if line.startswith("progress "):
+                if progress:
+                    progress(json.loads(line.split(" ", 1)[1]))
+            else:
+                errors.append(line)
+        output = stdout.read().decode()
+        agents.check("check_symlinks", stdout, stderr, "".join(errors))
+        try:
+            return json.loads(output)
+        except ValueError as err:
+            raise agents.AgentError(f"agent check_symlinks returned invalid output: "
+                                    f"{output[:200]}") from err
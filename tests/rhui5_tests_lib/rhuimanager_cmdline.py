@@ -1,5 +1,7 @@
 """ RHUIManagerCLI functions """
 
+from concurrent.futures import ThreadPoolExecutor
+import shlex
 import time
 
 import nose
@@ -7,6 +9,7 @@ import nose
 from stitches.expect import Expect
 
 from rhui5_tests_lib.helpers import Helpers
+from rhui5_tests_lib.repodata import RepodataCache
 from rhui5_tests_lib.util import Util
 
 DEFAULT_ENT_CERT = "/root/test_files/rhcert.pem"
@@ -50,6 +53,19 @@ def _get_repo_status(connection, repo_name):
         return status
     raise RuntimeError("Invalid repository name.")
 
+def _upload_chunk(connection, repo_id, directory, number, files, timeout):
+    '''
+    upload the given files from the directory to the custom repo; return True if it worked
+    '''
+    # the files are hard-linked to a temporary directory, which is then uploaded
+    chunk_dir = f"{directory}/.upload-{number}"
+    names = " ".join(shlex.quote(name) for name in files)
+    script = f"rm -rf {chunk_dir} && mkdir {chunk_dir} && cd {directory} && " \
+             f"ln -f {names} {chunk_dir}/ && " \
+             f"rhui-manager packages upload --repo_id {repo_id} --packages {chunk_dir}; " \
+             f"ret=$?; rm -rf {chunk_dir}; exit $ret"
+    return connection.recv_exit_status(f"rhua sh -c {shlex.quote(script)}", timeout) == 0
+
 def _wait_till_repo_synced(connection, repo_id, expect_success=True, use_json=True):
     '''
     wait until the specified repo ID is synchronized or the expected status occurs
@@ -238,6 +254,7 @@ class RHUIManagerCLI():
         '''
         sync a repo; wait until it's synced by default, or optionally only start syncing
         '''
+        RepodataCache.invalidate(repo_id)
         cmd = f"rhua rhui-manager repo sync --repo_id {repo_id}; echo $?"
         _, stdout, _ = connection.exec_command(cmd)
         output = stdout.read().decode()
@@ -265,6 +282,7 @@ class RHUIManagerCLI():
         '''
         sync all repos; wait until they're synced by default, or optionally only start syncing
         '''
+        RepodataCache.invalidate()
         cmd = "rhua rhui-manager repo sync_all"
         if cron:
             cmd += " --cron"
@@ -316,6 +334,7 @@ class RHUIManagerCLI():
         '''
         create a custom repo
         '''
+        RepodataCache.invalidate(repo_id)
         # compose the command
         cmd = f"rhua rhui-manager repo create_custom --repo_id {repo_id}"
         if path:
@@ -355,6 +374,7 @@ class RHUIManagerCLI():
         '''
         delete the given repo
         '''
+        RepodataCache.invalidate(repo_id)
         ecode = 0 if is_valid else 239
         Expect.expect_retval(connection,
                              f"rhua rhui-manager repo delete --repo_id {repo_id}",
@@ -365,6 +385,7 @@ class RHUIManagerCLI():
         '''
         associate errata metadata with a repo
         '''
+        RepodataCache.invalidate(repo_id)
         Expect.expect_retval(connection,
                              "rhua rhui-manager repo add_errata " +
                              f"--repo_id {repo_id} --updateinfo '{updateinfo}'",
@@ -375,6 +396,7 @@ class RHUIManagerCLI():
         '''
         associate comps metadata with a repo
         '''
+        RepodataCache.invalidate(repo_id)
         Expect.expect_retval(connection,
                              "rhua rhui-manager repo add_comps " +
                              f"--repo_id {repo_id} --comps {comps}",
@@ -467,6 +489,7 @@ class RHUIManagerCLI():
         '''
         upload packages from a remote URL to a custom repository
         '''
+        RepodataCache.invalidate(repo_id)
         cmd = f"rhua rhui-manager packages remote --repo_id {repo_id} --url {url}"
         ecode = 238 if empty else 0
         Expect.expect_retval(connection, cmd, ecode)
@@ -476,6 +499,7 @@ class RHUIManagerCLI():
         '''
         remove a package from a custom repo; an RPM name must used, and optionally version-release
         '''
+        RepodataCache.invalidate(repo_id)
         cmd = f"rhua rhui-manager packages remove --repo_id {repo_id} --package {package_name}"
         if package_vr:
             cmd += f" --vr {package_vr}"
@@ -484,13 +508,60 @@ class RHUIManagerCLI():
         Expect.expect_retval(connection, cmd)
 
     @staticmethod
-    def packages_upload(connection, repo_id, path, empty=False):
+    def packages_upload(connection, repo_id, path, empty=False, timeout=10):
         '''
         upload a package or a directory with packages to the custom repo
         '''
+        RepodataCache.invalidate(repo_id)
         cmd = f"rhua rhui-manager packages upload --repo_id {repo_id} --packages '{path}'"
         ecode = 238 if empty else 0
-        Expect.expect_retval(connection, cmd, ecode)
+        Expect.expect_retval(connection, cmd, ecode, timeout)
+
+    @staticmethod
+    def packages_upload_bulk(connection, repo_id, directory, chunk_size=500, workers=2):
+        '''
+        upload the packages in the directory to the custom repo in chunks, several at a time;
+        packages already in the repo are skipped, so an interrupted upload can be resumed
+        by running it again; return a dict with statistics
+        '''
+        start = time.time()
+        RepodataCache.invalidate(repo_id)
+        _, stdout, _ = connection.exec_command(f"rhua find {directory} -maxdepth 1 " +
+                                               "-name '*.rpm' -printf '%s %f\\n'")
+        sizes = {}
+        for line in stdout.read().decode().splitlines():
+            size, name = line.split(" ", 1)
+            sizes[name] = int(size)
+        present = set(RHUIManagerCLI.packages_list(connection, repo_id))
+        pending = sorted(name for name in sizes if name not in present)
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        with ThreadPoolExecutor(workers) as executor:
+            futures = []
+            for number, chunk in enumerate(chunks):
+                chunk_bytes = sum(sizes[name] for name in chunk)
+                # allow for a second per ten packages plus a second per megabyte
+                timeout = 60 + len(chunk) // 10 + chunk_bytes // 2**20
+                futures.append(executor.submit(_upload_chunk,
+                                               connection,
+                                               repo_id,
+                                               directory,
+                                               number,
+                                               chunk,
+                                               timeout))
+            failed = [name for chunk, future in zip(chunks, futures) if not future.result()
+                      for name in chunk]
+        failed_set = set(failed)
+        uploaded = [name for name in pending if name not in failed_set]
+        uploaded_bytes = sum(sizes[name] for name in uploaded)
+        seconds = time.time() - start
+        return {"files": len(uploaded),
+                "bytes": uploaded_bytes,
+                "skipped": len(sizes) - len(pending),
+                "failed": failed,
+                "chunks": len(chunks),
+                "seconds": seconds,
+                "files_per_second": len(uploaded) / seconds if seconds else 0.0,
+                "mb_per_second": uploaded_bytes / 2**20 / seconds if seconds else 0.0}
 
     @staticmethod
     def client_labels(connection):
@@ -1,8 +1,18 @@
 ''' Methods to manage other RHUI nodes '''
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import socket
+import time
+
 from rhui5_tests_lib.cfg import Config
 from rhui5_tests_lib.conmgr import ConMgr, SUDO_USER_NAME, SUDO_USER_KEY
 from rhui5_tests_lib.helpers import Helpers
+from rhui5_tests_lib.inventory import InstanceInventory
+
+ADD_TIMEOUT = 600
+# the number of output lines to keep for the results of add_many()
+OUTPUT_TAIL = 20
 
 def _validate_node_type(text):
     '''
@@ -12,6 +22,72 @@ def _validate_node_type(text):
     if text not in ok_types:
         raise ValueError(f"Unsupported node type: '{text}'. Use one of: {ok_types}.")
 
+def _add_command(connection, node_type, hostname, image, ssl_crt, ssl_key,
+                 haproxy_config_file, force, unsafe):
+    '''
+    Return the command to add a CDS or HAProxy node. See RHUIManagerCLIInstance.add().
+    '''
+    _validate_node_type(node_type)
+    if node_type == "haproxy" and (ssl_crt or ssl_key):
+        raise ValueError("SSL cert and/or key is meaningless when adding an HAproxy node")
+    if not hostname:
+        if node_type == "cds":
+            hostname = ConMgr.get_cds_hostnames()[0]
+        elif node_type == "haproxy":
+            hostname = ConMgr.get_lb_hostname()
+    # check if the auth file exists
+    auth_exists = Helpers.auth_exists(connection)
+    cmd = f"rhua rhui-manager {node_type} add " + \
+          f"--hostname {hostname} --ssh_user {SUDO_USER_NAME} --keyfile_path {SUDO_USER_KEY}"
+
+    registry_data = Config.get_registry_data(connection)
+    registry, username, password = registry_data[:3]
+    default_image = registry_data.cds_image if node_type == "cds" \
+                    else registry_data.haproxy_image
+
+    cmd += f" --container_registry {registry}"
+    if not auth_exists and username and password:
+        cmd += f" --registry_username {username}"
+        cmd += f" --registry_password {password}"
+    if image:
+        cmd += f" --container_image {image}"
+    elif default_image:
+        cmd += f" --container_image {default_image}"
+    if ssl_crt:
+        cmd += f" --user_supplied_ssl_crt {ssl_crt}"
+    if ssl_key:
+        cmd += f" --user_supplied_ssl_key {ssl_key}"
+    if haproxy_config_file:
+        cmd += f" --config {haproxy_config_file}"
+    if force:
+        cmd += " --force"
+    if unsafe:
+        cmd += " --unsafe"
+    return cmd
+
+def _run_add(connection, hostname, cmd, progress):
+    '''
+    Run the add command, passing its output to the progress function as it's printed.
+    Return the exit status (None on timeout), duration, number of attempts, and output tail.
+    '''
+    start = time.time()
+    _, stdout, _ = connection.exec_command(f"{cmd} 2>&1")
+    stdout.channel.settimeout(ADD_TIMEOUT)
+    output = deque(maxlen=OUTPUT_TAIL)
+    try:
+        for line in stdout:
+            line = line.rstrip("\n")
+            output.append(line)
+            if progress:
+                progress(hostname, line)
+        status = stdout.channel.recv_exit_status()
+    except socket.timeout:
+        status = None
+    return {"status": status,
+            "seconds": time.time() - start,
+            "attempts": 1,
+            "output": list(output)}
+
 class RHUIManagerCLIInstance():
     '''
     The rhui-manager command-line interface to control CDS and HAProxy nodes.
@@ -25,6 +101,19 @@ class RHUIManagerCLIInstance():
         _, stdout, _ = connection.exec_command(f"rhua rhui-manager {node_type} list")
         lines = stdout.read().decode()
         nodes = [line.split(":")[1].strip() for line in lines.splitlines() if "Hostname:" in line]
+        InstanceInventory.store(connection, node_type, nodes)
+        return nodes
+
+    @staticmethod
+    def inventory(connection, node_type):
+        '''
+        Return a list of CDS or HAProxy nodes (hostnames) as known from the last listing,
+        or list them now if they're unknown or may have changed. See inventory.py.
+        '''
+        _validate_node_type(node_type)
+        nodes = InstanceInventory.get(connection, node_type)
+        if nodes is None:
+            nodes = RHUIManagerCLIInstance.list(connection, node_type)
         return nodes
 
     @staticmethod
@@ -40,44 +129,64 @@ class RHUIManagerCLIInstance():
         Return True if the command exited with 0, and False otherwise.
         Note to the caller: Trust no one! Check for yourself if the node has really been added.
         '''
-        _validate_node_type(node_type)
-        if node_type == "haproxy" and (ssl_crt or ssl_key):
-            raise ValueError("SSL cert and/or key is meaningless when adding an HAproxy node")
-        if not hostname:
-            if node_type == "cds":
-                hostname = ConMgr.get_cds_hostnames()[0]
-            elif node_type == "haproxy":
-                hostname = ConMgr.get_lb_hostname()
-        # check if the auth file exists
-        auth_exists = Helpers.auth_exists(connection)
-        cmd = f"rhua rhui-manager {node_type} add " + \
-              f"--hostname {hostname} --ssh_user {SUDO_USER_NAME} --keyfile_path {SUDO_USER_KEY}"
-
-        registry_data = Config.get_registry_data(connection)
-        registry, username, password = registry_data[:3]
-        default_cds_image = registry_data[5]
-        default_haproxy_image = registry_data[6]
-        default_image = default_cds_image if node_type == "cds" else default_haproxy_image
+        cmd = _add_command(connection, node_type, hostname, image, ssl_crt, ssl_key,
+                           haproxy_config_file, force, unsafe)
+        try:
+            return connection.recv_exit_status(cmd, timeout=ADD_TIMEOUT) == 0
+        finally:
+            InstanceInventory.invalidate(node_type)
 
-        cmd += f" --container_registry {registry}"
-        if not auth_exists and username and password:
-            cmd += f" --registry_username {username}"
-            cmd += f" --registry_password {password}"
-        if image:
-            cmd += f" --container_image {image}"
-        elif default_image:
-            cmd += f" --container_image {default_image}"
-        if ssl_crt:
-            cmd += f" --user_supplied_ssl_crt {ssl_crt}"
-        if ssl_key:
-            cmd += f" --user_supplied_ssl_key {ssl_key}"
-        if haproxy_config_file:
-            cmd += f" --config {haproxy_config_file}"
-        if force:
-            cmd += " --force"
-        if unsafe:
-            cmd += " --unsafe"
-        return connection.recv_exit_status(cmd, timeout=600) == 0
+    @staticmethod
+    def add_many(connection, node_type,
+                 hostnames=None,
+                 workers=2,
+                 progress=None,
+                 retry=True,
+                 image="",
+                 ssl_crt="", ssl_key="",
+                 haproxy_config_file="",
+                 force=False, unsafe=False):
+        '''
+        Add several CDS or HAProxy nodes, running up to "workers" add commands at once.
+        If hostnames is empty, ConMgr will be used to determine all the known nodes of the type.
+        The "progress" parameter is a function to call with the hostname and each output line.
+        The nodes are then looked for in the list of nodes; the ones that failed or aren't listed
+        (concurrent runs can step on each other's toes, and a node can fail temporarily)
+        are added again one by one, unless "retry" is False.
+        Return a dict with the hostnames as keys and dicts with these keys as values:
+        "added" (exited with 0 and is listed), "status" (the exit status of the last attempt,
+        or None if it timed out), "seconds" (the duration of the last attempt), "attempts",
+        and "output" (the last lines of the output).
+        '''
+        if not hostnames:
+            _validate_node_type(node_type)
+            hostnames = ConMgr.get_cds_hostnames() if node_type == "cds" \
+                        else ConMgr.get_haproxy_hostnames()
+        commands = {hostname: _add_command(connection, node_type, hostname, image, ssl_crt,
+                                           ssl_key, haproxy_config_file, force, unsafe)
+                    for hostname in hostnames}
+        # the nodes are listed right afterwards, which refreshes the inventory
+        InstanceInventory.invalidate(node_type)
+        with ThreadPoolExecutor(max(min(workers, len(hostnames)), 1)) as executor:
+            futures = {hostname: executor.submit(_run_add,
+                                                 connection,
+                                                 hostname,
+                                                 commands[hostname],
+                                                 progress)
+                       for hostname in hostnames}
+            results = {hostname: future.result() for hostname, future in futures.items()}
+        nodes = RHUIManagerCLIInstance.list(connection, node_type)
+        failed = [hostname for hostname in hostnames
+                  if results[hostname]["status"] != 0 or hostname not in nodes]
+        if failed and retry:
+            for hostname in failed:
+                attempts = results[hostname]["attempts"]
+                results[hostname] = _run_add(connection, hostname, commands[hostname], progress)
+                results[hostname]["attempts"] += attempts
+            nodes = RHUIManagerCLIInstance.list(connection, node_type)
+        for hostname in hostnames:
+            results[hostname]["added"] = results[hostname]["status"] == 0 and hostname in nodes
+        return results
 
     @staticmethod
     def reinstall(connection, node_type, hostname="", all_nodes=False):
@@ -92,7 +201,10 @@ class RHUIManagerCLIInstance():
             cmd = f"rhua rhui-manager {node_type} reinstall --hostname {hostname}"
         else:
             raise ValueError("Either a hostname or '--all' must be used.")
-        return connection.recv_exit_status(cmd, timeout=540) == 0
+        try:
+            return connection.recv_exit_status(cmd, timeout=540) == 0
+        finally:
+            InstanceInventory.invalidate(node_type)
 
     @staticmethod
     def delete(connection, node_type, hostnames="", force=False):
@@ -110,7 +222,10 @@ class RHUIManagerCLIInstance():
         cmd = f"rhua rhui-manager {node_type} delete --hostnames {','.join(hostnames)}"
         if force:
             cmd += " --force"
-        return connection.recv_exit_status(cmd, timeout=180) == 0
+        try:
+            return connection.recv_exit_status(cmd, timeout=180) == 0
+        finally:
+            InstanceInventory.invalidate(node_type)
 
     @staticmethod
     def k8s(connection, key="", crt="", inject="", raw=False):
@@ -10,6 +10,13 @@ from rhui5_tests_lib.helpers import Helpers
 from rhui5_tests_lib.conmgr import ConMgr, SUDO_USER_NAME, SUDO_USER_KEY
 from rhui5_tests_lib.rhuimanager import RHUIManager
 from rhui5_tests_lib.instance import Instance
+from rhui5_tests_lib.inventory import InstanceInventory
+
+def _node_type(screen):
+    '''
+    Return the node type (as used in the inventory) managed in the given screen.
+    '''
+    return "cds" if screen == "cds" else "haproxy"
 
 class InstanceAlreadyExistsError(Exception):
     """
@@ -66,6 +73,7 @@ class RHUIManagerInstance():
         # check if the auth file exists
         auth_exists = Helpers.auth_exists(connection)
         # run rhui-manager and add the instance
+        InstanceInventory.invalidate(_node_type(screen))
         RHUIManager.screen(connection, screen)
         Expect.enter(connection, "a")
         Expect.expect(connection, ".*Hostname of the .*instance to register:")
@@ -107,9 +115,8 @@ class RHUIManagerInstance():
             raise InvalidSshKeyPath(SUDO_USER_KEY)
         registry_data = Config.get_registry_data(connection)
         registry, username, password = registry_data[:3]
-        default_cds_image = registry_data[5]
-        default_haproxy_image = registry_data[6]
-        default_image = default_cds_image if screen == "cds" else default_haproxy_image
+        default_image = registry_data.cds_image if screen == "cds" \
+                        else registry_data.haproxy_image
         Expect.enter(connection, registry)
         Expect.expect(connection, "Container image")
         Expect.enter(connection, image or default_image)
@@ -155,6 +162,7 @@ class RHUIManagerInstance():
         bad_instances = [i for i in instances if i not in hostnames]
         if bad_instances:
             raise NoSuchInstance(bad_instances)
+        InstanceInventory.invalidate(_node_type(screen))
         RHUIManager.screen(connection, screen)
         Expect.enter(connection, "d")
         RHUIManager.select_items(connection, instances)
@@ -166,6 +174,7 @@ class RHUIManagerInstance():
         '''
         unregister (delete) all CDS or HAProxy instances from the RHUI
         '''
+        InstanceInventory.invalidate(_node_type(screen))
         RHUIManager.screen(connection, screen)
         Expect.enter(connection, "d")
         Expect.expect(connection, "Enter value .*:")
@@ -189,7 +198,11 @@ class RHUIManagerInstance():
         ret = Instance.parse(lines)
         Expect.enter(connection, "q")
         time.sleep(5)
-        return [cds for _, cds in ret]
+        instances = [cds for _, cds in ret]
+        InstanceInventory.store(connection,
+                                _node_type(screen),
+                                [instance.host_name for instance in instances])
+        return instances
 
     @staticmethod
     def reinstall(connection, screen):
@@ -199,6 +212,7 @@ class RHUIManagerInstance():
         tracked_instances = RHUIManagerInstance.list(connection, screen)
         if not tracked_instances:
             raise NoSuchInstance()
+        InstanceInventory.invalidate(_node_type(screen))
         RHUIManager.screen(connection, screen)
         Expect.enter(connection, "r")
         Expect.expect(connection, "Enter value .*:")
@@ -6,6 +6,7 @@ import time
 from stitches.expect import CTRL_C, Expect
 
 from rhui5_tests_lib.cfg import Config
+from rhui5_tests_lib.repodata import RepodataCache
 from rhui5_tests_lib.rhuimanager import RHUIManager
 from rhui5_tests_lib.util import Util
 
@@ -257,6 +258,7 @@ class RHUIManagerRepo():
         '''
         delete a repository from the RHUI
         '''
+        RepodataCache.invalidate()
         RHUIManager.screen(connection, "repo")
         Expect.enter(connection, "d")
         RHUIManager.select(connection, repolist)
@@ -268,6 +270,7 @@ class RHUIManagerRepo():
         '''
         delete all repositories from the RHUI
         '''
+        RepodataCache.invalidate()
         RHUIManager.screen(connection, "repo")
         Expect.enter(connection, "d")
         status = Expect.expect_list(connection,
@@ -291,6 +294,7 @@ class RHUIManagerRepo():
         '''
         remove packages (a list of "N-V-R.A.rpm" items) from a custom repository
         '''
+        RepodataCache.invalidate()
         RHUIManager.screen(connection, "repo")
         Expect.enter(connection, "r")
         RHUIManager.select_one(connection, reponame)
@@ -305,6 +309,7 @@ class RHUIManagerRepo():
         '''
         remove all packages from a custom repository
         '''
+        RepodataCache.invalidate()
         RHUIManager.screen(connection, "repo")
         Expect.enter(connection, "r")
         RHUIManager.select_one(connection, reponame)
@@ -327,6 +332,7 @@ class RHUIManagerRepo():
         '''
         upload content to a custom repository
         '''
+        RepodataCache.invalidate()
         RHUIManager.screen(connection, "repo")
         Expect.enter(connection, "u")
         RHUIManager.select(connection, repolist)
@@ -343,6 +349,7 @@ class RHUIManagerRepo():
         '''
         upload content from a remote web site to a custom repository
         '''
+        RepodataCache.invalidate()
         RHUIManager.screen(connection, "repo")
         Expect.enter(connection, "ur")
         RHUIManager.select(connection, repolist)
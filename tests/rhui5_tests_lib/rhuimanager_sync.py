@@ -8,6 +8,7 @@ import nose
 from stitches.expect import Expect, CTRL_C
 
 from rhui5_tests_lib.cfg import RHUI_ROOT
+from rhui5_tests_lib.repodata import RepodataCache
 from rhui5_tests_lib.rhuimanager import RHUIManager
 from rhui5_tests_lib.rhuimanager_repo import RHUIManagerRepo
 from rhui5_tests_lib.util import Util
@@ -29,9 +30,40 @@ def _get_repo_status(connection, reponame):
 
 class RHUIManagerSync():
     """Represents -= Synchronization Status =- RHUI screen"""
+    @staticmethod
+    def sync_errors(lines,
+                    pattern="",
+                    ignore_beta=(),
+                    ignore_running=False,
+                    ignore_disabled=False):
+        """return problematic lines from the repo sync status screen, filtered as requested"""
+        # lines: the output of the "vr" screen without the header,
+        # pattern: only keep repos (and the line below each of them) matching this regex,
+        # ignore_beta: RHEL major versions whose Beta repos are not to be reported;
+        # the ignore_* options only apply when no pattern is used
+        errors = [line for line in lines if "Success" not in line and "Client Config" not in line]
+        if pattern:
+            matcher = re.compile("[ 0-9]+-.*" + pattern)
+            matches = []
+            for number, content in enumerate(errors):
+                if matcher.match(content):
+                    matches.extend(errors[number:number+2])
+            return matches
+        for version in ignore_beta:
+            beta_name = re.compile(f"Linux {version}.*Beta")
+            beta_path = f"beta/rhel{version}"
+            errors = [line for line in errors if not beta_name.search(line) and
+                                                 beta_path not in line]
+        if ignore_running:
+            errors = [line for line in errors if "Running" not in line]
+        if ignore_disabled:
+            errors = [line for line in errors if "Unknown" not in line and "None" not in line]
+        return errors
+
     @staticmethod
     def sync_repo(connection, repolist):
         """sync an individual repository immediately"""
+        RepodataCache.invalidate()
         RHUIManager.screen(connection, "sync")
         Expect.enter(connection, "sr")
         Expect.expect(connection, "Select one or more repositories.*for more commands:", 60)
@@ -1,59 +1,114 @@
 """Sos in RHUI"""
 
-import re
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
 
 import nose
+from paramiko import SSHException
+
+from rhui5_tests_lib import agents
+from rhui5_tests_lib.transfer import Transfer
+
+DEFAULT_PLUGINS = ["pulpcore", "rhui_containerized"]
 
 class Sos():
     """Sos handling for RHUI"""
     @staticmethod
-    def run(connection):
+    def run(connection, plugins=None, progress=None):
         """run the sosreport command"""
         # now run sosreport with only the relevant plug-ins enabled, return the tarball location
-        plugins = ["pulpcore", "rhui_containerized"]
+        # progress: a function to call with each line of the sos output as it's printed
+        plugins = plugins or DEFAULT_PLUGINS
         _, stdout, _ = connection.exec_command(f"sudo sos report -o {','.join(plugins)} --batch")
-        lines = stdout.read().decode().splitlines()
         # return the line below the one which indicates that the following line contains the path
         see_path = False
-        for line in lines:
-            if see_path:
-                return line.strip()
+        path = None
+        for line in stdout:
+            if progress:
+                progress(line.rstrip("\n"))
+            if see_path and path is None:
+                path = line.strip()
             if line.startswith("Your sos"):
                 # process the line in the next iteration
                 see_path = True
         # the in unlikely event that the output doesn't look as expected, return None
-        return None
+        return path
 
     @staticmethod
-    def check_files_in_archive(connection, filelist, archive):
-        """check if the files in the given filelist are collected in the given archive"""
+    def run_fleet(connections, plugins=None, local_dir="", progress=None):
+        """run sosreport on all the nodes at once; return a dict of hostnames and archives"""
+        # plugins: a dict of hostnames and lists of plug-ins, for nodes that need other than
+        # the default ones; with local_dir, the archives are fetched (also in parallel) to that
+        # directory, and the local paths are returned; the archive is None if sos failed
+        # or if the archive couldn't be fetched (the other nodes' archives are still returned);
+        # progress: a function to call with the hostname and each line of the sos output
+        plugins = plugins or {}
+
+        def collect(connection):
+            hostname = connection.hostname
+            archive = Sos.run(connection,
+                              plugins.get(hostname),
+                              (lambda line: progress(hostname, line)) if progress else None)
+            if archive and local_dir:
+                local_archive = os.path.join(local_dir, os.path.basename(archive))
+                try:
+                    Transfer.get(connection, archive, local_archive, verify=True)
+                except (OSError, SSHException) as err:
+                    if progress:
+                        progress(hostname, f"Failed to fetch {archive}: {err}")
+                    return None
+                if progress:
+                    progress(hostname, f"Fetched {archive} to {local_archive}")
+                return local_archive
+            return archive
+
+        with ThreadPoolExecutor(len(connections) or 1) as executor:
+            futures = {connection.hostname: executor.submit(collect, connection)
+                       for connection in connections}
+            return {hostname: future.result() for hostname, future in futures.items()}
+
+    @staticmethod
+    def inspect_archive(connection, archive, filelist=(), obfuscation_checks=()):
+        """check files and obfuscation in the archive in one pass; return the results"""
+        # obfuscation_checks: (match, path) tuples; the archive is read on the host that has it
+        # (see agents/inspect_archive.py), and the result is a dict with the number of members,
+        # a list of missing files, and a list of obfuscation check results
         # make sure the archive exists
         if connection.recv_exit_status(f"test -f {archive}"):
             raise OSError(f"{archive} does not exist")
-        # read the contents of the archive, and check if each file from the filelist is there
-        # must strip the path in front of the real root directory; the archive contains files like:
+        checks = {"files": list(filelist),
+                  "obfuscated": [{"match": match, "path": path}
+                                 for match, path in obfuscation_checks]}
+        return agents.run(connection, "inspect_archive", [archive, json.dumps(checks)])
+
+    @staticmethod
+    def check_inspected_files(result):
+        """check if all the wanted files were found in the inspected archive"""
+        nose.tools.ok_(not result["missing"],
+                       msg=f"Not found in the archive: {result['missing']}")
+
+    @staticmethod
+    def check_inspected_obfuscation(result):
+        """check if the values were obfuscated in the inspected archive"""
+        # a file that isn't in the archive has nothing to obfuscate
+        problems = [line for check in result["obfuscated"] for line in check["problems"]]
+        nose.tools.ok_(not problems, msg=f"Problematic lines: {problems}")
+
+    @staticmethod
+    def check_files_in_archive(connection, filelist, archive):
+        """check if the files in the given filelist are collected in the given archive"""
+        # the archive contains files like:
         # sosreport-HOST-DATE-HASH/dir/file.ext
         # while the given filelist contains /dir/file.ext (as seen in the container)
-        pattern = "^[^/]+"
-        _, stdout, _ = connection.exec_command(f"tar tf {archive}")
-        archive_filelist_raw = stdout.read().decode().splitlines()
-        archive_filelist = [re.sub(pattern, "", path) for path in archive_filelist_raw]
-        missing_files = [f for f in filelist if f not in archive_filelist]
-        nose.tools.ok_(not missing_files,
-                       msg=f"Not found in the archive: {missing_files}")
+        Sos.check_inspected_files(Sos.inspect_archive(connection, archive, filelist))
 
     @staticmethod
     def is_obfuscated(connection, match, path, archive):
         """check if the value of the option in the file (path) in the archive is obfuscated"""
-        # make sure the archive exists
-        if connection.recv_exit_status(f"test -f {archive}"):
-            raise OSError(f"{archive} does not exist")
-        # print the file from the archive
-        cmd = f"tar xf {archive} --wildcards 'sosreport-*{path}' -O"
-        _, stdout, _ = connection.exec_command(cmd)
-        lines = stdout.read().decode().splitlines()
-        problems = [line for line in lines if match in line and not line.endswith("********")]
-        nose.tools.ok_(not problems, msg=f"Problematic lines: {problems}")
+        Sos.check_inspected_obfuscation(Sos.inspect_archive(connection,
+                                                            archive,
+                                                            obfuscation_checks=[(match, path)]))
 
     @staticmethod
     def encode_sos_command(command, plugin="rhui_containerized"):
@@ -0,0 +1,575 @@
+"""Offline RHUA Stand-In"""
+
+# This module emulates the parts of a RHUA that the library talks to -- the rhua/cds/ha
+# command wrappers, rhui-manager CLI and TUI output, and the Pulp REST API reached via curl --
+# with a configurable dataset size and latency. ConMgr.connect() returns a stand-in connection
+# when the RHUI_STANDIN environment variable is set, so the library overhead can be measured
+# on any Linux machine without a deployed RHUI. Everything runs in-process; no SSH is involved.
+#
+# Environment variables (all optional except the first one), with their defaults:
+#   RHUI_STANDIN=1                  use the stand-in (any non-empty value)
+#   RHUI_STANDIN_LATENCY=0          seconds to wait per remote command or TUI input
+#   RHUI_STANDIN_REPOS=100          number of repos in the dataset
+#   RHUI_STANDIN_ENTITLEMENTS=20    number of entitlements in the dataset
+#   RHUI_STANDIN_CDS=2              number of registered CDS nodes
+
+from fnmatch import fnmatch
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shlex
+import socket
+import time
+import weakref
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from rhui5_tests_lib import synthetic
+from rhui5_tests_lib.cfg import CREDS, CREDS_HOST, RHUI_CFG_CUSTOM, RHUI_CFG_STATIC, RHUI_ROOT
+
+WRAPPERS = ["rhua", "cds", "ha"]
+SHELL_PROMPT = "[root@rhua ~]# "
+SCREENS = {"r": "repo",
+           "c": "cds",
+           "l": "haproxy",
+           "s": "sync",
+           "u": "users",
+           "e": "client",
+           "n": "entitlements"}
+HOST_CFG = "/var/lib/rhui/config/rhua/rhui-tools.conf"
+SUBSCRIPTION_SYNC_CFG = "/var/lib/rhui/config/rhua/rhui-subscription-sync.conf"
+
+class _Stream():
+    """the stdout/stderr of a finished stand-in command, usable like a paramiko ChannelFile"""
+    def __init__(self, data, channel):
+        self._buffer = io.BytesIO(data.encode() if isinstance(data, str) else data)
+        self.channel = channel
+
+    def read(self, size=-1):
+        """read bytes"""
+        return self._buffer.read(size)
+
+    def readline(self):
+        """read a line as text"""
+        return self._buffer.readline().decode()
+
+    def __iter__(self):
+        return iter(self.readline, "")
+
+class _Stdin():
+    """the stdin of a stand-in command; what's written is processed when the command finishes"""
+    def __init__(self, on_close, channel):
+        self._data = io.BytesIO()
+        self._on_close = on_close
+        self.channel = channel
+        channel.stdin = weakref.ref(self)
+
+    def write(self, data):
+        """collect the data"""
+        self._data.write(data.encode() if isinstance(data, str) else data)
+
+    def close(self):
+        """process the collected data"""
+        if self._on_close:
+            self._on_close(self._data.getvalue())
+            self._on_close = None
+
+    # like a paramiko channel, the stream is closed when the caller drops it
+    __del__ = close
+
+class _ExitChannel():
+    """carries the exit status of a stand-in command"""
+    def __init__(self, status):
+        self.status = status
+        self.stdin = None
+
+    def exit_status_ready(self):
+        """commands finish immediately"""
+        return True
+
+    def recv_exit_status(self):
+        """return the exit status, processing stdin first if the caller didn't close it"""
+        self.shutdown_write()
+        return self.status
+
+    def shutdown_write(self):
+        """EOF on stdin"""
+        stdin = self.stdin() if self.stdin else None
+        if stdin:
+            stdin.close()
+
+class StandInRHUA():
+    """the dataset and the command handlers of the stand-in"""
+    def __init__(self, repos=100, entitlements=20, cds=2, latency=0.0, seed=0):
+        self.latency = latency
+        self.repos = synthetic.repos(repos, seed)
+        self.entitlements = synthetic.entitlements(entitlements)
+        self.cds = [f"cds{index:02d}.example.com" for index in range(1, cds + 1)]
+        self.haproxy = ["lb.example.com"]
+        self.files = {RHUI_CFG_STATIC: b"[rhui]\ndefault_sync_policy: immediate\n"
+                                       b"retain_package_versions: 0\n"
+                                       b"[container]\nregistry_url: https://registry.redhat.io\n",
+                      HOST_CFG: b"[rhui]\n",
+                      SUBSCRIPTION_SYNC_CFG: b"[auth]\npassword = standin\n",
+                      CREDS: b"[rh]\nusername = standin\npassword = standin\n"
+                             b"[quay]\nusername = standin\npassword = standin\n",
+                      "/etc/redhat-release": b"Red Hat Enterprise Linux release 9.6 (Plow)\n",
+                      "/proc/sys/crypto/fips_enabled": b"0\n"}
+        self.mtimes = {}
+        self.symlinks = {}
+        self.tasks = []
+        self.commands = 0
+
+    @staticmethod
+    def from_environment():
+        """create a stand-in according to the RHUI_STANDIN_* environment variables"""
+        return StandInRHUA(repos=int(os.getenv("RHUI_STANDIN_REPOS", "100")),
+                           entitlements=int(os.getenv("RHUI_STANDIN_ENTITLEMENTS", "20")),
+                           cds=int(os.getenv("RHUI_STANDIN_CDS", "2")),
+                           latency=float(os.getenv("RHUI_STANDIN_LATENCY", "0")))
+
+    def _wait(self):
+        """simulate the network and remote processing time"""
+        self.commands += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, path):
+        """map a path as seen in the RHUA container (or a glob) to a stored file path"""
+        if path == RHUI_CFG_CUSTOM:
+            return HOST_CFG
+        if path == CREDS_HOST:
+            return CREDS
+        matches = [stored for stored in self.files if fnmatch(stored, path)]
+        return matches[0] if matches else path
+
+    def _repo(self, repo_id):
+        """find a repo by its ID"""
+        return next((repo for repo in self.repos if repo["id"] == repo_id), None)
+
+    def read_file(self, path):
+        """return the contents of a file, or None if it doesn't exist"""
+        path = self._path(path)
+        if path in self.files:
+            return self.files[path]
+        content_dir = f"{RHUI_ROOT}/symlinks/pulp/content/"
+        if path.startswith(content_dir) and path.endswith("/repodata/repomd.xml"):
+            relpath = path[len(content_dir):-len("/repodata/repomd.xml")]
+            if relpath in self.symlinks:
+                return synthetic.repomd_xml(revision=self.symlinks[relpath]).encode()
+        return None
+
+    def write_file(self, path, data):
+        """store a file"""
+        self.files[self._path(path)] = data
+        self.mtimes[self._path(path)] = time.time_ns()
+
+    def run(self, command, stdin=None):
+        """run a command, return the exit status, stdout and stderr"""
+        # stdin: the data written to the command, for "cat > file" (possibly in a sequence)
+        self._wait()
+        try:
+            args = shlex.split(command)
+        except ValueError:
+            return 2, "", "stand-in: unbalanced quotes\n"
+        # commands run through the container wrappers are handled like commands on the host
+        if args and args[0] in WRAPPERS:
+            if args[1:] == ["-h"]:
+                return (0, "usage: rhua COMMAND\n", "") if args[0] == "rhua" else (127, "", "")
+            args = args[1:]
+        if "&&" in args or ";" in command:
+            return self._run_sequence(command, stdin)
+        if stdin is not None and args[:2] == ["cat", ">"]:
+            self.write_file(args[2], stdin)
+            return 0, "", ""
+        handler = getattr(self, f"_cmd_{args[0].replace('-', '_')}", None) if args else None
+        if handler:
+            return handler(args[1:])
+        logging.debug("stand-in: unsupported command: %s", command)
+        return 127, "", f"stand-in: unsupported command: {command}\n"
+
+    def _run_sequence(self, command, stdin=None):
+        """run commands separated by && or ; (the parts must not contain quoted separators)"""
+        # variables can be set to a (globbed) path with NAME=$(echo PATH) and used as $NAME
+        status, stdout, stderr = 0, "", ""
+        variables = {}
+        for part in re.split(r"\s*(&&|;)\s*", command):
+            if part in ("&&", ";"):
+                if part == "&&" and status:
+                    break
+                continue
+            part = re.sub(r"\$(\w+)", lambda match: variables.get(match.group(1), match.group(0)),
+                          part)
+            assignment = re.match(r"^(\w+)=\$\(echo (\S+)\)$", part)
+            if assignment:
+                variables[assignment.group(1)] = self._path(assignment.group(2))
+                status = 0
+            elif part == "echo $?":
+                stdout += f"{status}\n"
+            elif part:
+                status, out, err = self.run(part, stdin)
+                self.commands -= 1
+                stdout += out
+                stderr += err
+        return status, stdout, stderr
+
+    # the host commands
+
+    def _cmd_cat(self, args):
+        contents = [self.read_file(path) for path in args if path != ">"]
+        if ">" in args:
+            return 0, "", ""
+        if None in contents:
+            return 1, "", "cat: No such file or directory\n"
+        return 0, b"".join(contents).decode(), ""
+
+    def _cmd_sha256sum(self, args):
+        contents = [(path, self.read_file(path)) for path in args]
+        if any(content is None for _, content in contents):
+            return 1, "", "sha256sum: No such file or directory\n"
+        return 0, "".join(f"{hashlib.sha256(content).hexdigest()}  {path}\n"
+                          for path, content in contents), ""
+
+    def _cmd_stat(self, args):
+        # only "stat -c '%y %s' PATH" is supported
+        content = self.read_file(args[-1])
+        if content is None:
+            return 1, "", "stat: No such file or directory\n"
+        mtime_ns = self.mtimes.get(self._path(args[-1]), 0)
+        mtime = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(mtime_ns // 10**9)) + \
+                f".{mtime_ns % 10**9:09d} +0000"
+        return 0, f"{mtime} {len(content)}\n", ""
+
+    def _cmd_test(self, args):
+        return (0, "", "") if len(args) == 2 and self.read_file(args[1]) is not None \
+               else (1, "", "")
+
+    def _cmd_rm(self, args):
+        for path in args:
+            self.files.pop(self._path(path), None)
+            if path.rstrip("/").endswith("symlinks/pulp"):
+                self.symlinks.clear()
+        return 0, "", ""
+
+    def _cmd_cp(self, args):
+        paths = [arg for arg in args if not arg.startswith("-")]
+        content = self.read_file(paths[0])
+        if content is None:
+            return 1, "", "cp: cannot stat\n"
+        self.write_file(paths[1], content)
+        return 0, "", ""
+
+    def _cmd_mv(self, args):
+        status, stdout, stderr = self._cmd_cp(args)
+        if not status:
+            self._cmd_rm([arg for arg in args if not arg.startswith("-")][:1])
+        return status, stdout, stderr
+
+    def _cmd_egrep(self, args):
+        content = self.read_file(args[-1])
+        if content is None:
+            return 2, "", ""
+        found = re.findall(args[-2], content.decode())
+        return (0, "\n".join(found) + "\n", "") if found else (1, "", "")
+
+    @staticmethod
+    def _cmd_arch(_):
+        return 0, "x86_64\n", ""
+
+    @staticmethod
+    def _cmd_echo(args):
+        return 0, " ".join(args) + "\n", ""
+
+    @staticmethod
+    def _cmd_ssh_keygen(_):
+        return 0, "", ""
+
+    def _cmd_find(self, args):
+        basedir = args[0]
+        paths = [path for path in self.files if path.startswith(basedir)]
+        return 0, "".join(f"{path}\n" for path in sorted(paths)), ""
+
+    # rhui-manager
+
+    def _cmd_rhui_manager(self, args):
+        command = " ".join(arg for arg in args[:2] if not arg.startswith("-"))
+        options = dict(zip(args, args[1:] + [""]))
+        if command == "cert info" or command == "cert upload":
+            return 0, synthetic.cert_info_output(self.entitlements), ""
+        if command == "repo list":
+            return 0, synthetic.repo_list_output(self.repos,
+                                                 "--ids_only" in args,
+                                                 "--redhat_only" in args,
+                                                 options.get("--delimiter", "")), ""
+        if command == "repo info":
+            repo = self._repo(options.get("--repo_id"))
+            if not repo:
+                return 0, f"repository {options.get('--repo_id')} was not found\n", ""
+            return 0, synthetic.repo_info_output(repo), ""
+        if command == "repo export":
+            repo = self._repo(options.get("--repo_id"))
+            if not repo:
+                return 239, "", ""
+            self.symlinks[repo["relativepath"]] = self.symlinks.get(repo["relativepath"], 0) + 1
+            return 0, "", ""
+        if command == "repo delete":
+            repo = self._repo(options.get("--repo_id"))
+            if not repo:
+                return 239, "", ""
+            self.repos.remove(repo)
+            return 0, "", ""
+        if command == "status":
+            if "--repo_json" in options:
+                self.write_file(options["--repo_json"].replace("/root", "/var/lib/rhui/root", 1),
+                                synthetic.status_json(self.repos).encode())
+            return 0, synthetic.status_output(self.repos), ""
+        if command in ("cds list", "haproxy list"):
+            hostnames = self.cds if command == "cds list" else self.haproxy
+            return 0, "\n".join(synthetic.instance_lines(hostnames)) + "\n", ""
+        if command == "packages list":
+            return 0, "".join(f"pkg-{index}-1.0-1.noarch.rpm\n" for index in range(50)), ""
+        if command == "client labels":
+            return 0, "".join(f"{repo['id']}\n" for repo in self.repos), ""
+        return 0, "", ""
+
+    # the Pulp API
+
+    def _cmd_curl(self, args):
+        method = "GET"
+        urls = []
+        write_out = ""
+        skip = False
+        for index, arg in enumerate(args):
+            if skip:
+                skip = False
+                continue
+            if arg in ("-X", "-u", "-d", "-o", "-w"):
+                if arg == "-X":
+                    method = args[index + 1]
+                elif arg == "-d" and method == "GET":
+                    method = "POST"
+                elif arg == "-w":
+                    write_out = args[index + 1]
+                skip = True
+            elif arg.startswith("https://"):
+                urls.append(arg)
+        # like curl, print the -w text after each response; only %{http_code} and
+        # %{url_effective} are supported
+        status = "200" if method == "GET" else "202"
+        return 0, "".join(json.dumps(self._pulp_request(method, url)) +
+                          write_out.replace("\\n", "\n")
+                          .replace("%{http_code}", status)
+                          .replace("%{url_effective}", url)
+                          for url in urls), ""
+
+    def _pulp_collection(self, path):
+        """return the list of objects at the given Pulp API path"""
+        for prefix, factory in (("/pulp/api/v3/repositories/rpm/rpm/", synthetic.pulp_repo),
+                                ("/pulp/api/v3/remotes/rpm/rpm/", synthetic.pulp_remote),
+                                ("/pulp/api/v3/distributions/rpm/rpm/",
+                                 synthetic.pulp_distribution)):
+            if path == prefix:
+                return [factory(repo) for repo in self.repos]
+        if path.endswith("/versions/"):
+            return [{"pulp_href": f"{path}{number}/", "number": number} for number in (1, 0)]
+        if path == "/pulp/api/v3/tasks/":
+            return self.tasks
+        return []
+
+    def _pulp_request(self, method, url):
+        """handle a Pulp API request"""
+        parts = urlsplit(url)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if method == "DELETE":
+            # the remotes and distributions are derived from the repos, only repos are deleted
+            if "/repositories/" in parts.path:
+                index = int(parts.path.rstrip("/").rsplit("/", 1)[-1].split("-")[0], 16)
+                self.repos = [repo for repo in self.repos if repo["index"] != index]
+            return {"task": "/pulp/api/v3/tasks/00000000-0000-0000-0000-000000000000/"}
+        if method == "POST":
+            return {"task": "/pulp/api/v3/tasks/00000000-0000-0000-0000-000000000000/"}
+        results = self._pulp_collection(parts.path)
+        if "name" in query:
+            results = [result for result in results if result.get("name") == query["name"]]
+        if "fields" in query:
+            fields = query["fields"].split(",")
+            results = [{key: result.get(key) for key in fields} for result in results]
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", 100))
+        page = results[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(results):
+            next_query = urlencode({**query, "offset": offset + limit, "limit": limit})
+            next_url = parts._replace(query=next_query).geturl()
+        return {"count": len(results),
+                "next": next_url,
+                "previous": None,
+                "results": page}
+
+    # the TUI
+
+    def tui(self, state, line):
+        """process a line entered in the TUI; return the new state and the output"""
+        if state == "shell":
+            if re.match(r"^(rhua )?rhui-manager$", line):
+                return "home", "rhui (home) => "
+            _, stdout, stderr = self.run(line)
+            return "shell", f"{stdout}{stderr}".replace("\n", "\r\n") + SHELL_PROMPT
+        if line == "q":
+            return "shell", SHELL_PROMPT
+        if state == "home":
+            if line in SCREENS:
+                return SCREENS[line], f"rhui ({SCREENS[line]}) => "
+            return "home", "rhui (home) => "
+        prompt = f"rhui ({state}) => "
+        if line != "l":
+            return state, f"stand-in: unsupported input\r\n{prompt}"
+        if state == "repo":
+            lines = ["", "Custom Repositories"]
+            lines += [f"  {repo['name']}" for repo in self.repos if not repo["redhat"]]
+            lines += ["", "Red Hat Repositories", "Yum"]
+            lines += [f"  {repo['name']} ({repo['version']}) ({repo['kind']})"
+                      for repo in self.repos if repo["redhat"]]
+            lines += ["", "-" * 78]
+        elif state in ("cds", "haproxy"):
+            lines = ["", *synthetic.instance_lines(self.cds if state == "cds" else self.haproxy)]
+        elif state == "entitlements":
+            lines = ["", "Red Hat Entitlements", "", "  \x1b[92mValid\x1b[0m"]
+            for entitlement in self.entitlements:
+                lines += [f"    {entitlement}", "    Expiration: 12-31-2049", ""]
+        else:
+            lines = [""]
+        return state, "\r\n".join(lines) + f"\r\n{prompt}"
+
+class StandInChannel():
+    """an interactive shell channel with rhui-manager running in the stand-in"""
+    def __init__(self, rhua):
+        self._rhua = rhua
+        self._state = "shell"
+        self._output = ""
+        self._input = ""
+
+    def send(self, data):
+        """type something; every complete line is processed immediately, with echo"""
+        self._input += data
+        while "\n" in self._input:
+            line, self._input = self._input.split("\n", 1)
+            self._rhua._wait()
+            self._state, output = self._rhua.tui(self._state, line.strip())
+            self._output += f"{line}\r\n{output}"
+        return len(data)
+
+    def recv(self, size):
+        """return what's been printed; raise socket.timeout if nothing, like a real channel"""
+        if not self._output:
+            raise socket.timeout()
+        data, self._output = self._output[:size], self._output[size:]
+        return data.encode()
+
+    def recv_ready(self):
+        """True if there's something to read"""
+        return bool(self._output)
+
+class StandInSFTP():
+    """file transfers to and from the stand-in"""
+    def __init__(self, rhua):
+        self._rhua = rhua
+
+    def get(self, remotepath, localpath):
+        """download a file"""
+        self._rhua._wait()
+        content = self._rhua.read_file(remotepath)
+        if content is None:
+            raise FileNotFoundError(remotepath)
+        with open(localpath, "wb") as localfile:
+            localfile.write(content)
+
+    def put(self, localpath, remotepath):
+        """upload a file"""
+        self._rhua._wait()
+        with open(localpath, "rb") as localfile:
+            self._rhua.write_file(remotepath, localfile.read())
+
+class StandInConnection():
+    """a connection to the stand-in with the interface of stitches.connection.Connection"""
+    def __init__(self, hostname, rhua):
+        self.hostname = hostname
+        self.rhua = rhua
+        self.channel = StandInChannel(rhua)
+        self.sftp = StandInSFTP(rhua)
+        self.output_shell = False
+        self.last_command = ""
+
+    def exec_command(self, command, bufsize=-1, get_pty=False):
+        """run the command in the stand-in; return stdin, stdout and stderr"""
+        # pylint: disable=unused-argument
+        self.last_command = command
+        # stdin is only of any use with "cat > file", possibly in a sequence of commands, which
+        # then runs when stdin is closed; its output is discarded, only the exit status is kept
+        if re.search(r"(?:^|&& )(?:\w+ )?cat > \S+(?: &&|$)", command):
+            channel = _ExitChannel(None)
+
+            def finish(data):
+                channel.status = self.rhua.run(command, data)[0]
+
+            return _Stdin(finish, channel), _Stream("", channel), _Stream("", channel)
+        status, stdout, stderr = self.rhua.run(command)
+        channel = _ExitChannel(status)
+        return _Stdin(None, channel), _Stream(stdout, channel), _Stream(stderr, channel)
+
+    def recv_exit_status(self, command, timeout=10, get_pty=False):
+        """run the command in the stand-in and return its exit status"""
+        # pylint: disable=unused-argument
+        self.last_command = command
+        return self.rhua.run(command)[0]
+
+    def disconnect(self):
+        """nothing to do"""
+
+class ReplayConnection():
+    """a connection that answers every command, and the TUI, with the same canned output"""
+    # handy for feeding the library's parsers with synthetic data of any size
+    def __init__(self, output):
+        self.output = output
+        self.channel = self
+        self.output_shell = False
+        self._pending = output
+
+    def exec_command(self, command, bufsize=-1, get_pty=False):
+        """return the canned output as stdout"""
+        # pylint: disable=unused-argument
+        channel = _ExitChannel(0)
+        return _Stdin(None, channel), _Stream(self.output, channel), _Stream("", channel)
+
+    def recv_exit_status(self, command, timeout=10, get_pty=False):
+        """every command succeeds"""
+        # pylint: disable=unused-argument
+        return 0
+
+    def send(self, data):
+        """ignore the input, but let the canned output be printed again"""
+        self._pending = self.output
+        return len(data)
+
+    def recv(self, size):
+        """print the canned output (once per input)"""
+        # pylint: disable=unused-argument
+        # all of it at once, so that Expect doesn't sleep between chunks and only parsing counts
+        if not self._pending:
+            raise socket.timeout()
+        data, self._pending = self._pending, ""
+        return data.encode()
+
+_STANDIN = []
+
+def get_standin():
+    """return the stand-in shared by all connections in this process"""
+    if not _STANDIN:
+        _STANDIN.append(StandInRHUA.from_environment())
+    return _STANDIN[0]
+
+def enabled():
+    """return True if the stand-in is to be used instead of real RHUI nodes"""
+    return bool(os.getenv("RHUI_STANDIN"))
@@ -0,0 +1,253 @@
+"""Synthetic RHUI Data of Configurable Size"""
+
+# These generators produce data that looks like what RHUI and its tools print or serve,
+# at any scale. They are used by the offline RHUA stand-in and by the benchmarks.
+
+import json
+import random
+
+PRODUCTS = ["Red Hat Enterprise Linux for x86_64",
+            "Red Hat Enterprise Linux for ARM 64",
+            "Red Hat Enterprise Linux for SAP Applications for x86_64",
+            "Red Hat Enterprise Linux High Availability for x86_64",
+            "Red Hat CodeReady Linux Builder for x86_64",
+            "Red Hat Ansible Automation Platform"]
+KINDS = ["RPMs", "Debug RPMs", "Source RPMs"]
+SYNC_STATES = ["Success", "Success", "Success", "Running", "Error", "Never", "Unknown"]
+
+def _rng(seed):
+    """return a random number generator; the same seed always gives the same data"""
+    return random.Random(seed)
+
+def repos(count, seed=0):
+    """return a list of dicts describing Red Hat and custom repos"""
+    rng = _rng(seed)
+    repo_list = []
+    for index in range(count):
+        if index % 10 == 9:
+            repo_id = f"custom-{index}"
+            repo_list.append({"index": index,
+                              "id": repo_id,
+                              "name": repo_id,
+                              "version": "",
+                              "kind": "",
+                              "relativepath": f"protected/{repo_id}",
+                              "redhat": False,
+                              "state": rng.choice(SYNC_STATES)})
+            continue
+        product = PRODUCTS[index % len(PRODUCTS)]
+        kind = KINDS[index % len(KINDS)]
+        major = 8 + index % 3
+        minor = index % 10
+        repo_id = f"rhel-{major}-{index}-{kind.split()[0].lower()}-{major}.{minor}"
+        repo_list.append({"index": index,
+                          "id": repo_id,
+                          "name": f"{product} - {kind} ({major}.{minor}) #{index}",
+                          "version": f"{major}.{minor}",
+                          "kind": kind,
+                          "relativepath": f"content/dist/rhel{major}/{major}.{minor}/x86_64/"
+                                          f"repo{index}/{kind.split()[0].lower()}",
+                          "redhat": True,
+                          "state": rng.choice(SYNC_STATES)})
+    return repo_list
+
+def entitlements(count):
+    """return a list of entitlement (product) names"""
+    return [f"{PRODUCTS[index % len(PRODUCTS)]} ({KINDS[index % len(KINDS)]}) #{index}"
+            for index in range(count)]
+
+def cert_info_output(ent_list, status="\x1b[92mValid\x1b[0m"):
+    """return rhui-manager cert info output for the given entitlements"""
+    lines = ["Red Hat Entitlements", "", f"  {status}"]
+    for entitlement in ent_list:
+        lines.append(f"    {entitlement}")
+        lines.append("    Expiration: 12-31-2049   Certificate: rhcert.pem")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+def repo_list_output(repo_list, ids_only=False, redhat_only=False, delimiter=""):
+    """return rhui-manager repo list output for the given repos"""
+    if redhat_only:
+        repo_list = [repo for repo in repo_list if repo["redhat"]]
+    if ids_only:
+        ids = sorted(repo["id"] for repo in repo_list)
+        return (delimiter or "\n").join(ids) + "\n"
+    return "\n".join(f"{repo['id']} :: {repo['name']}" for repo in repo_list) + "\n"
+
+def repo_info_output(repo):
+    """return rhui-manager repo info output for the given repo"""
+    lines = [f"Name:                {repo['name']}",
+             f"ID:                  {repo['id']}",
+             f"Type:                {'Red Hat' if repo['redhat'] else 'Custom'}",
+             f"Version:             {repo['version'] or 'None'}",
+             f"Relative Path:       {repo['relativepath']}",
+             "GPG Check:           Yes",
+             f"Last Sync:           {'Never' if repo['state'] == 'Never' else '2025-01-01'}"]
+    return "\n".join(lines) + "\n"
+
+def status_output(repo_list):
+    """return rhui-manager status output for the given repos"""
+    colors = {"Success": "\x1b[92m", "Error": "\x1b[91m"}
+    lines = ["Entitlement CA certificate expiration date = 2049-12-31 \x1b[92mOK\x1b[0m", ""]
+    for repo in repo_list:
+        state = repo["state"].upper()
+        lines.append(f"{repo['name']}   2025-01-01 00:00:00   "
+                     f"{colors.get(repo['state'], '')}{state}\x1b[0m")
+    return "\n".join(lines) + "\n"
+
+def status_json(repo_list):
+    """return the JSON data that rhui-manager status --repo_json writes"""
+    results = {"Success": "completed", "Error": "failed", "Running": "running"}
+    return json.dumps([{"id": repo["id"],
+                        "group": "redhat" if repo["redhat"] else "custom",
+                        "last_sync_result": results.get(repo["state"])}
+                       for repo in repo_list])
+
+def instance_lines(hostnames, user_name="ec2-user", ssh_key_path="/root/.ssh/id_ecdsa_launchpad"):
+    """return lines describing CDS or HAProxy nodes as shown in rhui-manager"""
+    lines = []
+    for hostname in hostnames:
+        lines.append(f"  Hostname:          {hostname}")
+        lines.append(f"  SSH Username:      {user_name}")
+        lines.append(f"  SSH Private Key:   {ssh_key_path}")
+        lines.append("")
+    return lines
+
+def _uuid(repo):
+    """return a fake UUID for the Pulp objects of the given repo"""
+    return f"{repo['index']:08x}-0000-0000-0000-000000000000"
+
+def pulp_repo(repo):
+    """return a Pulp API representation of the given repo"""
+    href = f"/pulp/api/v3/repositories/rpm/rpm/{_uuid(repo)}/"
+    return {"pulp_href": href,
+            "name": repo["id"],
+            "versions_href": f"{href}versions/",
+            "latest_version_href": f"{href}versions/1/",
+            "retain_repo_versions": 5,
+            "remote": f"/pulp/api/v3/remotes/rpm/rpm/{_uuid(repo)}/"}
+
+def pulp_remote(repo):
+    """return a Pulp API representation of the remote for the given repo"""
+    return {"pulp_href": f"/pulp/api/v3/remotes/rpm/rpm/{_uuid(repo)}/",
+            "name": repo["id"],
+            "url": f"https://cdn.redhat.com/{repo['relativepath']}/",
+            "policy": "immediate"}
+
+def pulp_distribution(repo):
+    """return a Pulp API representation of the distribution for the given repo"""
+    return {"pulp_href": f"/pulp/api/v3/distributions/rpm/rpm/{_uuid(repo)}/",
+            "name": repo["id"],
+            "base_path": repo["relativepath"],
+            "repository": None}
+
+def repomd_xml(datatypes=("primary", "filelists", "other", "updateinfo", "group"), revision=1):
+    """return a repomd.xml document listing the given data types"""
+    data = []
+    for datatype in datatypes:
+        extension = "xml" if datatype == "group" else "xml.gz"
+        checksum = f"{revision:04d}{datatype}".ljust(64, "0")[:64]
+        data.append(f'  <data type="{datatype}">\n'
+                    f'    <checksum type="sha256">{checksum}</checksum>\n'
+                    f'    <location href="repodata/{checksum}-{datatype}.{extension}"/>\n'
+                    f'    <timestamp>{1700000000 + revision}</timestamp>\n'
+                    '  </data>\n')
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<repomd xmlns="http://linux.duke.edu/metadata/repo">\n'
+            f'  <revision>{revision}</revision>\n' + "".join(data) + '</repomd>\n')
+
+def comps_xml(groups, packages_per_group=10, langpacks=0, package_names=None):
+    """return a comps.xml document with the given number of groups and langpacks"""
+    # the groups contain made-up packages, or the given packages (round robin)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<comps>\n']
+    for index in range(groups):
+        visible = "true" if index % 4 else "false"
+        parts.append(f"  <group>\n    <id>group-{index}</id>\n"
+                     f"    <name>Group {index}</name>\n"
+                     f"    <name xml:lang=\"de\">Gruppe {index}</name>\n"
+                     f"    <uservisible>{visible}</uservisible>\n    <packagelist>\n")
+        for pkg in range(packages_per_group):
+            if package_names:
+                name = package_names[(index * packages_per_group + pkg) % len(package_names)]
+            else:
+                name = f"pkg-{index}-{pkg}"
+            parts.append(f"      <packagereq type=\"default\">{name}</packagereq>\n")
+        parts.append("    </packagelist>\n  </group>\n")
+    if langpacks:
+        parts.append("  <langpacks>\n")
+        for index in range(langpacks):
+            parts.append(f"    <match install=\"pkg-{index}-langpack-%s\" name=\"pkg-{index}\"/>\n")
+        parts.append("  </langpacks>\n")
+    parts.append("</comps>\n")
+    return "".join(parts)
+
+def rpm_spec(names, version="1.0", release="1", files=1, file_size=1024):
+    """return an RPM spec file building a noarch package with each of the given names"""
+    # the first name is the main package, the others are subpackages; each package contains
+    # the given number of files of random data, so the packages can't be compressed much
+    header = ("%global debug_package %{nil}\n"
+              "%global __os_install_post %{nil}\n"
+              "%global _binary_payload w1.gzdio\n"
+              f"Name: {names[0]}\nVersion: {version}\nRelease: {release}\n"
+              f"Summary: Synthetic package {names[0]}\nLicense: GPLv2\nBuildArch: noarch\n"
+              "%description\nSynthetic package for load testing.\n")
+    subpackages = "".join(f"%package -n {name}\nSummary: Synthetic package {name}\n"
+                          f"%description -n {name}\nSynthetic package for load testing.\n"
+                          for name in names[1:])
+    install = ("%install\n"
+               f"for p in {' '.join(names)}; do\n"
+               "  d=%{buildroot}/usr/share/synthetic/$p\n"
+               "  mkdir -p $d\n"
+               f"  for f in $(seq {files}); do\n"
+               f"    head -c {file_size} /dev/urandom > $d/file-$f\n"
+               "  done\n"
+               "done\n")
+    file_lists = f"%files\n/usr/share/synthetic/{names[0]}\n"
+    file_lists += "".join(f"%files -n {name}\n/usr/share/synthetic/{name}\n"
+                          for name in names[1:])
+    return header + subpackages + install + file_lists
+
+def updateinfo_xml(advisories, packages, packages_per_advisory=5, seed=0):
+    """return an updateinfo.xml document with advisories for the given packages"""
+    # packages: a list of dicts with the name, version, release, and arch
+    rng = _rng(seed)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<updates>\n']
+    for index in range(advisories):
+        kind = rng.choice(["security", "bugfix", "enhancement"])
+        parts.append(f'  <update from="rhui-qe@redhat.com" status="final" type="{kind}" '
+                     'version="1">\n'
+                     f"    <id>SYNTH-2025:{index + 1:05d}</id>\n"
+                     f"    <title>Synthetic {kind} advisory {index + 1}</title>\n"
+                     '    <issued date="2025-01-01 00:00:00"/>\n'
+                     "    <severity>Moderate</severity>\n"
+                     f"    <description>Synthetic advisory {index + 1}.</description>\n"
+                     "    <references/>\n    <pkglist>\n      <collection short=\"synthetic\">\n"
+                     "        <name>synthetic</name>\n")
+        for pkg_index in range(packages_per_advisory):
+            pkg = packages[(index * packages_per_advisory + pkg_index) % len(packages)]
+            name, version, release, arch = pkg["name"], pkg["version"], pkg["release"], pkg["arch"]
+            parts.append(f'        <package arch="{arch}" epoch="0" name="{name}" '
+                         f'release="{release}" src="{name}-{version}-{release}.src.rpm" '
+                         f'version="{version}">\n'
+                         f"          <filename>{name}-{version}-{release}.{arch}.rpm</filename>\n"
+                         "        </package>\n")
+        parts.append("      </collection>\n    </pkglist>\n  </update>\n")
+    parts.append("</updates>\n")
+    return "".join(parts)
+
+def selection_lines(items):
+    """return lines of a rhui-manager multiple-choice screen with the given items"""
+    lines = []
+    for number, item in enumerate(items, 1):
+        lines.append(f"  -  {number} :")
+        lines.append(f"    {item}")
+    return lines
+
+def sync_status_lines(repo_list):
+    """return lines of the rhui-manager repo sync status screen (without the header)"""
+    lines = []
+    for number, repo in enumerate(repo_list, 1):
+        lines.append(f"{number:>4} - {repo['name']}   2025-01-01 00:00   {repo['state']}")
+        if repo["state"] == "Error":
+            lines.append(f"       Error: failed to sync {repo['relativepath']}")
+    return lines
@@ -0,0 +1,116 @@
+"""Synthetic RPM Repositories for Load Testing"""
+
+# Content-scale tests need repos of a given size, which the real repos available to the tested
+# certificate may not provide. A synthetic repo is a custom repo with made-up packages: they're
+# built by rpmbuild in the RHUA container (which has it for client configuration RPMs), many
+# subpackages per spec file and several spec files in parallel, so even tens of thousands of
+# packages take minutes rather than hours. The packages are then uploaded, and optionally
+# errata and comps metadata referring to them are added, all via rhui-manager.
+
+import shlex
+import time
+
+from stitches.expect import Expect
+
+from rhui5_tests_lib import synthetic
+from rhui5_tests_lib.rhuimanager_cmdline import RHUIManagerCLI
+
+# the same directory on the RHUA host and in the RHUA container
+BUILD_DIR_HOST = "/var/lib/rhui/root/synthetic"
+BUILD_DIR = "/root/synthetic"
+PACKAGES_PER_SPEC = 500
+
+class SyntheticRepo():
+    """build and publish custom repos with made-up packages"""
+    @staticmethod
+    def package_names(repo_id, packages):
+        """return the names of the packages in the synthetic repo"""
+        return [f"synth-{repo_id}-{index:06d}" for index in range(packages)]
+
+    @staticmethod
+    def build(connection, repo_id, packages, files=1, file_size=1024, versions=1, workers=4):
+        """build the packages; return the directory with the RPM files and a list of packages"""
+        # the directory is a path in the RHUA container; packages: dicts with the name,
+        # version, release, and arch; each package is built in the given number of versions
+        host_dir = f"{BUILD_DIR_HOST}/{repo_id}"
+        topdir = f"{BUILD_DIR}/{repo_id}"
+        Expect.expect_retval(connection, f"rm -rf {host_dir} && mkdir -p {host_dir}/SPECS")
+        names = SyntheticRepo.package_names(repo_id, packages)
+        package_list = []
+        for version in range(1, versions + 1):
+            for start in range(0, packages, PACKAGES_PER_SPEC):
+                batch = names[start:start + PACKAGES_PER_SPEC]
+                spec = synthetic.rpm_spec(batch, f"{version}.0", "1", files, file_size)
+                with connection.sftp.open(f"{host_dir}/SPECS/{batch[0]}-{version}.spec",
+                                          "w") as spec_file:
+                    spec_file.write(spec)
+                package_list.extend({"name": name,
+                                     "version": f"{version}.0",
+                                     "release": "1",
+                                     "arch": "noarch"} for name in batch)
+        build = f"ls {topdir}/SPECS/*.spec | " \
+                f"xargs -P {workers} -n 1 rpmbuild --quiet -bb --define '_topdir {topdir}' " \
+                f"> {topdir}/build.log 2>&1"
+        # allow for about 0.1 second per package and file, which is plenty
+        timeout = 60 + packages * versions * files // 10
+        Expect.expect_retval(connection, f"rhua sh -c {shlex.quote(build)}", timeout=timeout)
+        return f"{topdir}/RPMS/noarch", package_list
+
+    @staticmethod
+    def publish(connection,
+                repo_id,
+                packages,
+                files=1,
+                file_size=1024,
+                versions=1,
+                advisories=0,
+                groups=0,
+                packages_per_group=10,
+                workers=4):
+        """create the custom repo with synthetic content; return the duration of each step"""
+        durations = {}
+        start = time.time()
+        rpm_dir, package_list = SyntheticRepo.build(connection,
+                                                    repo_id,
+                                                    packages,
+                                                    files,
+                                                    file_size,
+                                                    versions,
+                                                    workers)
+        durations["build"] = time.time() - start
+        start = time.time()
+        RHUIManagerCLI.repo_create_custom(connection, repo_id)
+        durations["create"] = time.time() - start
+        start = time.time()
+        upload = RHUIManagerCLI.packages_upload_bulk(connection, repo_id, rpm_dir)
+        if upload["failed"]:
+            raise RuntimeError(f"{len(upload['failed'])} packages failed to upload")
+        durations["upload"] = time.time() - start
+        if advisories:
+            with connection.sftp.open(f"{BUILD_DIR_HOST}/{repo_id}/updateinfo.xml",
+                                      "w") as updateinfo:
+                updateinfo.write(synthetic.updateinfo_xml(advisories, package_list))
+            start = time.time()
+            RHUIManagerCLI.repo_add_errata(connection,
+                                           repo_id,
+                                           f"{BUILD_DIR}/{repo_id}/updateinfo.xml")
+            durations["errata"] = time.time() - start
+        if groups:
+            with connection.sftp.open(f"{BUILD_DIR_HOST}/{repo_id}/comps.xml", "w") as comps:
+                comps.write(synthetic.comps_xml(groups,
+                                                packages_per_group,
+                                                package_names=SyntheticRepo.package_names(
+                                                    repo_id,
+                                                    packages)))
+            start = time.time()
+            RHUIManagerCLI.repo_add_comps(connection,
+                                          repo_id,
+                                          f"{BUILD_DIR}/{repo_id}/comps.xml")
+            durations["comps"] = time.time() - start
+        return durations
+
+    @staticmethod
+    def remove(connection, repo_id):
+        """delete the synthetic repo and the files it was built from"""
+        RHUIManagerCLI.repo_delete(connection, repo_id)
+        Expect.expect_retval(connection, f"rm -rf {BUILD_DIR_HOST}/{repo_id}")
@@ -0,0 +1,132 @@
+"""Package Transactions on Many Clients at Once"""
+
+# A transaction is a yum install, downgrade, or download of a set of packages on a client.
+# Apart from the exit code, the details are collected in the same command on the client:
+# the NEVRAs that got installed and removed (from rpm -qa before and after), the RPM files that
+# were downloaded and their sizes (kept in the yum cache just for the measurement), and
+# the duration. Running a transaction on many clients at once happens in parallel threads,
+# one per client connection.
+
+from concurrent.futures import ThreadPoolExecutor
+import shlex
+import socket
+import time
+
+ACTIONS = ["install", "downgrade", "download"]
+CACHE_DIRS = "/var/cache/yum /var/cache/dnf"
+NEVRA_FORMAT = "%{NAME}-%{EPOCHNUM}:%{VERSION}-%{RELEASE}.%{ARCH}\\n"
+TAG = "@@@"
+
+def _command(action, packages, gpgcheck, downloaddir):
+    """return the yum command for the transaction"""
+    pkgs = " ".join(shlex.quote(package) for package in packages)
+    if action == "download":
+        cmd = f"yumdownloader {pkgs}"
+        if downloaddir:
+            cmd += f" --downloaddir {shlex.quote(downloaddir)}"
+        return cmd
+    cmd = f"yum -y --setopt=keepcache=1 {action} {pkgs}"
+    if not gpgcheck:
+        cmd += " --nogpgcheck"
+    return cmd
+
+def _script(action, packages, gpgcheck, downloaddir):
+    """return a shell script running the transaction and printing the details"""
+    rpm_dirs = shlex.quote(downloaddir or ".") if action == "download" else CACHE_DIRS
+    # the freshly downloaded RPM files are removed from the cache; they're only kept to be counted
+    delete = "" if action == "download" else " -delete"
+    return (f"m=$(mktemp); rpm -qa --qf '{NEVRA_FORMAT}' | sort > $m.before; "
+            "s=$(date +%s.%N); "
+            f"{_command(action, packages, gpgcheck, downloaddir)} > $m.log 2>&1; r=$?; "
+            "e=$(date +%s.%N); "
+            f"rpm -qa --qf '{NEVRA_FORMAT}' | sort > $m.after; "
+            f"echo {TAG} ecode $r; echo {TAG} seconds $s $e; "
+            f"find {rpm_dirs} -name '*.rpm' -newer $m -printf '{TAG} file %s %f\\n'{delete} "
+            "2>/dev/null; "
+            f"comm -13 $m.before $m.after | sed 's/^/{TAG} installed /'; "
+            f"comm -23 $m.before $m.after | sed 's/^/{TAG} removed /'; "
+            f"tail -20 $m.log | sed 's/^/{TAG} log /'; "
+            "rm -f $m $m.before $m.after $m.log")
+
+def _parse(hostname, action, output):
+    """return the transaction details from the output of the script"""
+    result = {"host": hostname,
+              "action": action,
+              "ecode": None,
+              "seconds": 0.0,
+              "installed": [],
+              "removed": [],
+              "files": [],
+              "bytes": 0,
+              "log": []}
+    for line in output.splitlines():
+        if not line.startswith(TAG):
+            continue
+        _, key, value = (line.split(" ", 2) + [""])[:3]
+        if key == "ecode":
+            result["ecode"] = int(value)
+        elif key == "seconds":
+            start, end = value.split()
+            result["seconds"] = float(end) - float(start)
+        elif key == "file":
+            size, name = value.split(" ", 1)
+            result["files"].append(name)
+            result["bytes"] += int(size)
+        elif key in ("installed", "removed", "log"):
+            result[key].append(value)
+    result["throughput"] = result["bytes"] / result["seconds"] if result["seconds"] else 0.0
+    return result
+
+class YumTransactions():
+    """run yum transactions on clients and measure them"""
+    @staticmethod
+    def run(connection, action, packages, gpgcheck=True, downloaddir="", timeout=300):
+        """run the transaction on the client; return a dict with the details"""
+        # keys: host, action, ecode, seconds, installed and removed (NEVRAs), files (downloaded),
+        # bytes (downloaded), throughput (bytes/s), log (the last lines of yum output), ok
+        if action not in ACTIONS:
+            raise ValueError(f"Unsupported action: {action}")
+        start = time.time()
+        _, stdout, _ = connection.exec_command(_script(action, packages, gpgcheck, downloaddir))
+        stdout.channel.settimeout(timeout)
+        try:
+            output = stdout.read().decode()
+        except socket.timeout:
+            output = f"{TAG} log timed out after {timeout} seconds"
+        result = _parse(connection.hostname, action, output)
+        result["wall_seconds"] = time.time() - start
+        result["ok"] = result["ecode"] == 0
+        return result
+
+    @staticmethod
+    def run_all(connections,
+                action,
+                packages,
+                gpgcheck=True,
+                downloaddir="",
+                timeout=300,
+                workers=None):
+        """run the transaction on all the clients in parallel; return a list of details"""
+        # the order of the results matches the order of the connections
+        with ThreadPoolExecutor(workers or len(connections) or 1) as executor:
+            futures = [executor.submit(YumTransactions.run,
+                                       connection,
+                                       action,
+                                       packages,
+                                       gpgcheck,
+                                       downloaddir,
+                                       timeout)
+                       for connection in connections]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def summary(results):
+        """return the totals for a list of transaction details"""
+        total_bytes = sum(result["bytes"] for result in results)
+        wall_seconds = max((result["wall_seconds"] for result in results), default=0.0)
+        return {"clients": len(results),
+                "failed": [result["host"] for result in results if not result["ok"]],
+                "bytes": total_bytes,
+                "max_seconds": max((result["seconds"] for result in results), default=0.0),
+                "wall_seconds": wall_seconds,
+                "throughput": total_bytes / wall_seconds if wall_seconds else 0.0}
@@ -0,0 +1,174 @@
+"""Fast File Transfers between the Test Machine and the Remote Hosts"""
+
+# A plain SFTP get or put waits for each 32 kB request to be answered before sending the next one,
+# so on a link with high latency, big files (sos report archives, RPM sets, ...) take ages.
+# Here, the file is split into byte ranges which are transferred by several workers at once,
+# each with its own SFTP session, and each sending its requests without waiting for the replies
+# (readv for reading, pipelined writes for writing). The ranges are written at their offsets,
+# so no reassembly is needed. Small files are simply transferred via the connection's own
+# SFTP session, which also pipelines its requests.
+# Alternatively, the file can be compressed on the fly: it's then streamed through gzip
+# on the remote host, which is worth it for text files like logs.
+# Optionally, the SHA-256 checksum of the copy is compared with the one of the original.
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import shlex
+import time
+import zlib
+
+RANGE_SIZE = 8 * 1024 * 1024
+REQUEST_SIZE = 32 * 1024
+# files smaller than this are transferred by one worker
+PARALLEL_THRESHOLD = 2 * RANGE_SIZE
+
+class TransferError(OSError):
+    """
+    To be raised if a transferred file doesn't match the original.
+    """
+
+def _ranges(size):
+    """return a list of (offset, length) tuples covering a file of the given size"""
+    return [(offset, min(RANGE_SIZE, size - offset)) for offset in range(0, size, RANGE_SIZE)]
+
+def _local_digest(path):
+    """return the SHA-256 hex digest of the local file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fobj:
+        for chunk in iter(lambda: fobj.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _remote_digest(connection, path):
+    """return the SHA-256 hex digest of the remote file"""
+    _, stdout, _ = connection.exec_command(f"sha256sum {shlex.quote(path)}")
+    return stdout.read().decode().split(" ", 1)[0]
+
+def _get_ranges(connection, remote_path, fd, ranges):
+    """copy the ranges of the remote file to the local file descriptor"""
+    sftp = connection.cli.open_sftp()
+    try:
+        with sftp.open(remote_path, "rb") as remote_file:
+            for offset, length in ranges:
+                requests = [(start, min(REQUEST_SIZE, offset + length - start))
+                            for start in range(offset, offset + length, REQUEST_SIZE)]
+                for (start, _), data in zip(requests, remote_file.readv(requests)):
+                    os.pwrite(fd, data, start)
+    finally:
+        sftp.close()
+
+def _put_ranges(connection, fd, remote_path, ranges):
+    """copy the ranges of the local file descriptor to the remote file"""
+    sftp = connection.cli.open_sftp()
+    try:
+        with sftp.open(remote_path, "r+b") as remote_file:
+            remote_file.set_pipelined(True)
+            for offset, length in ranges:
+                remote_file.seek(offset)
+                for start in range(offset, offset + length, REQUEST_SIZE):
+                    remote_file.write(os.pread(fd, min(REQUEST_SIZE, offset + length - start),
+                                               start))
+    finally:
+        sftp.close()
+
+def _result(size, start, digest=""):
+    """return the statistics of a transfer"""
+    seconds = time.time() - start
+    return {"bytes": size,
+            "seconds": seconds,
+            "mb_per_second": size / 2**20 / seconds if seconds else 0.0,
+            "sha256": digest}
+
+class Transfer():
+    """copy files to and from remote hosts"""
+    @staticmethod
+    def get(connection, remote_path, local_path, workers=4, compress=False, verify=False):
+        """copy the remote file to the local path; return the statistics"""
+        # statistics: a dict with the number of bytes, seconds, MB/s, and checksum (if verified)
+        start = time.time()
+        with ThreadPoolExecutor(workers + 1) as executor:
+            remote_digest = executor.submit(_remote_digest, connection, remote_path) \
+                            if verify else None
+            if compress:
+                _, stdout, _ = connection.exec_command(f"gzip -1 -c {shlex.quote(remote_path)}")
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                with open(local_path, "wb") as local_file:
+                    for chunk in iter(lambda: stdout.read(RANGE_SIZE), b""):
+                        local_file.write(decompressor.decompress(chunk))
+                    local_file.write(decompressor.flush())
+                if stdout.channel.recv_exit_status():
+                    raise TransferError(f"could not read {remote_path}")
+                size = os.path.getsize(local_path)
+            else:
+                size = connection.sftp.stat(remote_path).st_size
+                if size < PARALLEL_THRESHOLD:
+                    connection.sftp.get(remote_path, local_path)
+                else:
+                    ranges = _ranges(size)
+                    fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                    try:
+                        os.ftruncate(fd, size)
+                        futures = [executor.submit(_get_ranges,
+                                                   connection,
+                                                   remote_path,
+                                                   fd,
+                                                   ranges[index::workers])
+                                   for index in range(workers)]
+                        for future in futures:
+                            future.result()
+                    finally:
+                        os.close(fd)
+            if not verify:
+                return _result(size, start)
+            digest = _local_digest(local_path)
+            if digest != remote_digest.result():
+                raise TransferError(f"{local_path}: checksum {digest}, "
+                                    f"expected {remote_digest.result()}")
+        return _result(size, start, digest)
+
+    @staticmethod
+    def put(connection, local_path, remote_path, workers=4, compress=False, verify=False):
+        """copy the local file to the remote path; return the statistics"""
+        # statistics: a dict with the number of bytes, seconds, MB/s, and checksum (if verified)
+        start = time.time()
+        size = os.path.getsize(local_path)
+        with ThreadPoolExecutor(workers + 1) as executor:
+            local_digest = executor.submit(_local_digest, local_path) if verify else None
+            if compress:
+                cmd = f"gzip -dc > {shlex.quote(remote_path)}"
+                stdin, stdout, _ = connection.exec_command(cmd)
+                compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                with open(local_path, "rb") as local_file:
+                    for chunk in iter(lambda: local_file.read(RANGE_SIZE), b""):
+                        stdin.write(compressor.compress(chunk))
+                stdin.write(compressor.flush())
+                stdin.channel.shutdown_write()
+                if stdout.channel.recv_exit_status():
+                    raise TransferError(f"could not write {remote_path}")
+            else:
+                if size < PARALLEL_THRESHOLD:
+                    connection.sftp.put(local_path, remote_path)
+                else:
+                    with connection.sftp.open(remote_path, "wb") as remote_file:
+                        remote_file.truncate(size)
+                    ranges = _ranges(size)
+                    fd = os.open(local_path, os.O_RDONLY)
+                    try:
+                        futures = [executor.submit(_put_ranges,
+                                                   connection,
+                                                   fd,
+                                                   remote_path,
+                                                   ranges[index::workers])
+                                   for index in range(workers)]
+                        for future in futures:
+                            future.result()
+                    finally:
+                        os.close(fd)
+            if not verify:
+                return _result(size, start)
+            digest = _remote_digest(connection, remote_path)
+            if digest != local_digest.result():
+                raise TransferError(f"{remote_path}: checksum {digest}, "
+                                    f"expected {local_digest.result()}")
+        return _result(size, start, digest)
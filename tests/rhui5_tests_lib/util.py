@@ -1,16 +1,91 @@
 """ Utility functions """
 
+import codecs
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
+import io
 import os
+from os.path import basename
 import re
-import tempfile
+import shlex
+from urllib.parse import urlsplit
 import urllib3
+import uuid
 
 import certifi
+import nose
 from stitches.expect import Expect
 
 from rhui5_tests_lib.cfg import RHUI_ROOT
 from rhui5_tests_lib.conmgr import ConMgr
+from rhui5_tests_lib.transfer import Transfer
+
+CHUNK_SIZE = 64 * 1024
+RPM_LINK_PATTERN = re.compile(r"<a href=\"([^\"]*\.rpm)")
+# shared by all HTTP requests made by this module
+POOL = urllib3.PoolManager(num_pools=16,
+                           maxsize=8,
+                           cert_reqs="CERT_REQUIRED",
+                           ca_certs=certifi.where())
+_RPM_LINK_CACHE = {}
+# files relayed between hosts, keyed by the SHA-256 checksum; only files up to the given size
+# are kept (in memory), and the oldest ones are dropped when the cache gets full
+_RELAY_CACHE = {}
+RELAY_CACHE_FILE_LIMIT = 16 * 1024 * 1024
+RELAY_CACHE_LIMIT = 128 * 1024 * 1024
+
+def _client_ssl_files(connection):
+    """return the client entitlement certificate, key and CA file paths from yum repo files"""
+    _, stdout, _ = connection.exec_command("grep -h -E '^ *(sslclientcert|sslclientkey|sslcacert)' "
+                                           "/etc/yum.repos.d/*.repo")
+    files = {}
+    for line in stdout.read().decode().splitlines():
+        option, _, value = line.partition("=")
+        files.setdefault(option.strip(), value.strip())
+    return files.get("sslclientcert"), files.get("sslclientkey"), files.get("sslcacert")
+
+def _fetch_rpm_links(url):
+    """return a list of RPM files linked from an HTML page, or an empty list"""
+    # pages are remembered with their ETag and Last-Modified headers, and requested again
+    # conditionally; links are extracted while the page is being downloaded
+    cached = _RPM_LINK_CACHE.get(url)
+    headers = {}
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        response = POOL.request("GET", url, headers=headers, preload_content=False)
+    except (urllib3.exceptions.SSLError, urllib3.exceptions.MaxRetryError):
+        # if the URL can't be reached, consider it an empty page
+        return []
+    try:
+        if response.status == 304 and cached:
+            return list(cached["rpms"])
+        if response.status != 200:
+            return []
+        rpms = []
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        carry = ""
+        for chunk in response.stream(CHUNK_SIZE):
+            text = carry + decoder.decode(chunk)
+            # a link can be split between chunks; keep the (possibly incomplete) last tag
+            cut = text.rfind("<")
+            if cut == -1:
+                cut = len(text)
+            rpms += RPM_LINK_PATTERN.findall(text, 0, cut)
+            carry = text[cut:]
+        rpms += RPM_LINK_PATTERN.findall(carry + decoder.decode(b"", final=True))
+    except urllib3.exceptions.HTTPError:
+        return []
+    finally:
+        response.release_conn()
+    if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+        _RPM_LINK_CACHE[url] = {"etag": response.headers.get("ETag"),
+                                "last_modified": response.headers.get("Last-Modified"),
+                                "rpms": rpms}
+    return list(rpms)
 
 class Util():
     '''
@@ -71,36 +146,95 @@ class Util():
         if pedantic and installed != rpmlist:
             raise OSError(f"{set(rpmlist) - set(installed)}: not installed, could not remove")
 
+    @staticmethod
+    def relay_file(source_connection, source_path, target_connections, target_path, workers=8):
+        '''
+        Copy a file from one host to one or more other hosts; return its SHA-256 checksum.
+        '''
+        # the data goes straight from the source SFTP session to the target ones, without a local
+        # temporary file; small files are read once, cached by checksum, and written to the targets
+        # in parallel; bigger files are read in chunks, each written to all the targets in turn
+        _, stdout, _ = source_connection.exec_command(f"sha256sum {shlex.quote(source_path)}")
+        digest = stdout.read().decode().split(" ", 1)[0]
+        if not digest:
+            raise OSError(f"{source_path} is unreadable on {source_connection.hostname}")
+        data = _RELAY_CACHE.get(digest)
+        if data is None:
+            with source_connection.sftp.open(source_path, "rb") as source_file:
+                if source_file.stat().st_size > RELAY_CACHE_FILE_LIMIT:
+                    source_file.prefetch()
+                    target_files = [connection.sftp.open(target_path, "wb")
+                                    for connection in target_connections]
+                    try:
+                        for target_file in target_files:
+                            target_file.set_pipelined(True)
+                        for chunk in iter(lambda: source_file.read(CHUNK_SIZE), b""):
+                            for target_file in target_files:
+                                target_file.write(chunk)
+                    finally:
+                        for target_file in target_files:
+                            target_file.close()
+                    return digest
+                source_file.prefetch()
+                data = source_file.read()
+            while _RELAY_CACHE and sum(map(len, _RELAY_CACHE.values())) + len(data) > \
+                  RELAY_CACHE_LIMIT:
+                del _RELAY_CACHE[next(iter(_RELAY_CACHE))]
+            _RELAY_CACHE[digest] = data
+        with ThreadPoolExecutor(max(min(workers, len(target_connections)), 1)) as executor:
+            for future in [executor.submit(connection.sftp.putfo, io.BytesIO(data), target_path)
+                           for connection in target_connections]:
+                future.result()
+        return digest
+
     @staticmethod
     def install_pkg_from_rhua(rhua_connection, target_connection, pkgpath, allow_update=False):
         '''
         Transfer a package from the RHUA to the target node and install it there.
         '''
+        Util.install_pkg_from_rhua_multi(rhua_connection,
+                                         [target_connection],
+                                         pkgpath,
+                                         allow_update)
+
+    @staticmethod
+    def install_pkg_from_rhua_multi(rhua_connection,
+                                    target_connections,
+                                    pkgpath,
+                                    allow_update=False,
+                                    workers=8):
+        '''
+        Transfer a package from the RHUA to the target nodes and install it there, in parallel.
+        '''
         # the package can be an RPM file to install/update using rpm -- typically a RHUI client
         # configuration RPM,
         target_file_name = "/tmp/" + os.path.basename(pkgpath)
         option = "U" if allow_update else "i"
         cmd = f"rpm -{option} {target_file_name}"
 
-        local_file = tempfile.NamedTemporaryFile(delete=False)
-        local_file.close()
+        Util.relay_file(rhua_connection, pkgpath, target_connections, target_file_name, workers)
 
-        rhua_connection.sftp.get(pkgpath, local_file.name)
-        target_connection.sftp.put(local_file.name, target_file_name)
+        def install(target_connection):
+            try:
+                Expect.expect_retval(target_connection, cmd)
+            finally:
+                Expect.expect_retval(target_connection, "rm -f " + target_file_name)
 
-        Expect.expect_retval(target_connection, cmd)
-
-        os.unlink(local_file.name)
-        Expect.expect_retval(target_connection, "rm -f " + target_file_name)
+        with ThreadPoolExecutor(max(min(workers, len(target_connections)), 1)) as executor:
+            for future in [executor.submit(install, target_connection)
+                           for target_connection in target_connections]:
+                future.result()
 
     @staticmethod
     def get_saved_password(connection,
-                           creds_file="/var/lib/rhui/config/rhua/rhui-subscription-sync.conf"):
+                           creds_file="/var/lib/rhui/config/rhua/rhui-subscription-sync.conf",
+                           sudo=False):
         '''
         Read rhui-manager password from the rhui-subscription-sync configuration file
+        (use sudo if connected as a non-root user; the file is only readable by root)
         '''
         creds_cfg = ConfigParser(interpolation=None)
-        _, stdout, _ = connection.exec_command("cat " + creds_file)
+        _, stdout, _ = connection.exec_command(("sudo -n cat " if sudo else "cat ") + creds_file)
         creds_cfg.read_file(stdout)
         return creds_cfg.get("auth", "password") if creds_cfg.has_section("auth") else None
 
@@ -153,19 +287,20 @@ class Util():
         '''
         return a list of RPM files linked from an HTML page (e.g. a directory listing)
         '''
-        poolmgr = urllib3.PoolManager(cert_reqs="CERT_REQUIRED", ca_certs=certifi.where())
-        try:
-            request = poolmgr.request("GET", url)
-            content = request.data.decode()
-            rpmlinks = re.findall(r"<a href=\"[^\"]*\.rpm", content)
-            rpms = [rpmlink.replace("<a href=\"", "") for rpmlink in rpmlinks]
-        except (urllib3.exceptions.SSLError, urllib3.exceptions.MaxRetryError):
-            # if the URL can't be reached, consider it an empty page
-            rpms = []
+        rpms = _fetch_rpm_links(url)
         if rpms:
             return rpms
         raise RuntimeError("No RPMs found!")
 
+    @staticmethod
+    def get_rpm_links_multi(urls, workers=8):
+        '''
+        return a dict of URLs and lists of RPM files linked from the pages, fetched in parallel
+        '''
+        # unlike get_rpm_links, this doesn't raise an exception for a page without RPM links
+        with ThreadPoolExecutor(workers) as executor:
+            return dict(zip(urls, executor.map(_fetch_rpm_links, urls)))
+
     @staticmethod
     def check_package_url(connection, package, path=""):
         '''
@@ -182,6 +317,91 @@ class Util():
                          f"https://{ConMgr.get_lb_hostname()}" +
                          f"/pulp/content/{path}.*{package_escaped}")
 
+    @staticmethod
+    def resolve_package_urls(connection, packages):
+        '''
+        return a dict of package names and their URLs (or None) as resolved by yum on the client
+        '''
+        # all the packages are resolved by one yumdownloader process
+        cmd = "yumdownloader --url " + " ".join(shlex.quote(package) for package in packages)
+        _, stdout, _ = connection.exec_command(cmd)
+        urls = [line.strip() for line in stdout.read().decode().splitlines()
+                if line.startswith("http")]
+        resolved = {}
+        for package in packages:
+            # a package can be specified by its name, or by a longer string, such as NVR;
+            # prefer an exact match of the name in the URL file name
+            candidates = [url for url in urls if basename(url).startswith(package)]
+            exact = [url for url in candidates if basename(url).rsplit("-", 2)[0] == package]
+            resolved[package] = (exact or candidates or [None])[0]
+        return resolved
+
+    @staticmethod
+    def verify_package_urls(connection,
+                            urls,
+                            cert="",
+                            key="",
+                            cacert="",
+                            parallel=8,
+                            range_bytes=1024,
+                            cds_connections=None):
+        '''
+        request the beginning of each package from the client, several at once; return the details
+        '''
+        # The client entitlement certificate, key and CA are taken from the yum configuration
+        # on the client unless specified. The result is a list of dicts with the URL, the HTTP
+        # status, the latency (in seconds), the downloaded bytes, and "ok".
+        # If CDS connections are given, each result also says which CDS served the request,
+        # as found in the nginx logs on the CDS nodes by a unique user agent string.
+        if not cert:
+            cert, key, cacert = _client_ssl_files(connection)
+        token = f"rhui5-tests-{uuid.uuid4().hex}"
+        curl = f"curl -s -o /dev/null -r 0-{range_bytes - 1} -A {token} " \
+               f"--cert {cert} --key {key} --cacert {cacert} " \
+               "-w '%{http_code} %{time_total} %{size_download} %{url_effective}\\n'"
+        cmd = f"xargs -P {parallel} -n 1 {curl}"
+        stdin, stdout, _ = connection.exec_command(cmd)
+        stdin.write("".join(f"{url}\n" for url in urls))
+        stdin.channel.shutdown_write()
+        results = []
+        for line in stdout.read().decode().splitlines():
+            status, seconds, size, url = line.split(" ", 3)
+            results.append({"url": url,
+                            "status": int(status),
+                            "seconds": float(seconds),
+                            "bytes": int(size),
+                            "ok": status in ("200", "206")})
+        if cds_connections:
+            served_by = {}
+            for cds_connection in cds_connections:
+                _, stdout, _ = cds_connection.exec_command("cds sh -c " +
+                                                           shlex.quote(f"grep -h {token} "
+                                                                       "/var/log/nginx/*.log"))
+                for log_line in stdout.read().decode().splitlines():
+                    for path in re.findall(r'"[A-Z]+ (\S+)', log_line):
+                        served_by[path] = cds_connection.hostname
+            for result in results:
+                result["cds"] = served_by.get(urlsplit(result["url"]).path)
+        return results
+
+    @staticmethod
+    def check_package_urls(connection, packages, path=""):
+        '''
+        verify that the packages are available from the RHUI, like check_package_url, but in bulk
+        '''
+        # the packages are resolved at once, and then requested from the load balancer at once;
+        # return the details about the requests (see verify_package_urls)
+        urls = Util.resolve_package_urls(connection, packages)
+        for package, url in urls.items():
+            expected = f"https://{ConMgr.get_lb_hostname()}/pulp/content/{path}.*" + \
+                       re.escape(package)
+            nose.tools.ok_(url and re.match(expected, url),
+                           msg=f"{package}: unexpected URL {url}, expected {expected}")
+        results = Util.verify_package_urls(connection, list(urls.values()))
+        failed = [result for result in results if not result["ok"]]
+        nose.tools.ok_(not failed, msg=f"unavailable packages: {failed}")
+        return results
+
     @staticmethod
     def cert_expired(connection, cert, seconds=0):
         '''
@@ -198,7 +418,7 @@ class Util():
         '''
         fetch a file from the remote host
         '''
-        connection.sftp.get(source, dest)
+        Transfer.get(connection, source, dest)
 
     @staticmethod
     def safe_pulp_repo_name(name):
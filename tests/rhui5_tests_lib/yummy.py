@@ -1,115 +1,148 @@
 """Functions for Yum Commands and Repodata Handling"""
 
+import json
+import re
+import shlex
 import time
+import weakref
 
 from stitches.expect import Expect
-import xmltodict
 
+from rhui5_tests_lib import agents, metadata
 from rhui5_tests_lib.cfg import RHUI_ROOT
+from rhui5_tests_lib.repodata import RepodataCache
 from rhui5_tests_lib.rhuimanager_cmdline import RHUIManagerCLI
 
+PARSERS = {"primary": metadata.packages,
+           "filelists": metadata.package_files,
+           "updateinfo": metadata.advisories,
+           "group": metadata.groups}
+
+SESSION_SEPARATOR = "@@@ yum session query exit code:"
+FINGERPRINT_CMD = "find /etc/yum.repos.d /etc/pki/rhui /etc/yum.conf /etc/dnf/dnf.conf " \
+                  "-type f -printf '%p %s %T@\\n' 2>/dev/null | sort | md5sum"
+# what dnf and yum (on RHEL 7) say if they're to use the cache only, but some metadata is missing
+CACHE_MISS_RE = re.compile(r"(Cache-only|Caching) enabled but no (local )?cache")
+
+def _parse_grouplist(lines):
+    """return a sorted list of yum groups from yum grouplist output"""
+    # yum groups are on lines that start with three spaces
+    return sorted(line.strip() for line in lines if line.startswith("   "))
+
+def _parse_group_packages(lines):
+    """return a sorted list of packages from yum groupinfo output"""
+    # packages are on lines that start with three spaces
+    packagelist = [line.strip() for line in lines if line.startswith("   ")]
+    # in addition, the package names can start with +, -, or = depending on the status
+    # (see man yum -> groups)
+    # so, let's remove such signs if they're present
+    packagelist = [pkg[1:] if pkg[0] in ["+", "-", "="] else pkg for pkg in packagelist]
+    return sorted(packagelist)
+
+def _repolist_args(alll, enabled, disabled):
+    """return the yum repolist arguments for the given options"""
+    if alll:
+        return " all"
+    if disabled:
+        return " disabled"
+    if enabled:
+        return ""
+    raise ValueError("You cannot turn all options off.")
+
+def _parse_repolist(lines):
+    """return a list of repo IDs from yum repolist output"""
+    repos = [line.split()[0] for line in lines if line.strip() and not line.startswith("repo ")]
+    # on RHEL 7, the repos are in fact like .../7Server/x86_64; strip that
+    return [repo.split("/")[0] for repo in repos]
+
 class Yummy():
     """various functions to test yum commands and repodata"""
     @staticmethod
     def repodata_location(connection, repo, datatype):
         """return the path to the repository file (on the RHUA) of the given data type"""
         # data types are : filelists, group, primary, updateinfo etc.
-        # export the repo to make sure the symlinks exist
-        RHUIManagerCLI.repo_export(connection, repo)
-        time.sleep(3)
         base_path = f"{RHUI_ROOT}/symlinks/pulp/content"
-        relative_path = RHUIManagerCLI.repo_info(connection, repo)["relativepath"]
-        repodata_file = f"{base_path}/{relative_path}/repodata/repomd.xml"
-        _, stdout, _ = connection.exec_command(f"cat {repodata_file}")
-        repodata = xmltodict.parse(stdout.read())
-        location_list = [data["location"]["@href"] for data in repodata["repomd"]["data"] \
-                         if data["@type"] == datatype]
-        if location_list:
-            location = location_list[0]
-            wanted_file = f"{base_path}/{relative_path}/{location}"
+        # if the repodata revision hasn't changed since the last lookup, use the cached data
+        cached = RepodataCache.get(repo)
+        if cached:
+            repodata_file = f"{base_path}/{cached['relativepath']}/repodata/repomd.xml"
+            if not RepodataCache.is_current(connection, cached, repodata_file):
+                cached = None
+        if not cached:
+            # export the repo to make sure the symlinks exist
+            RHUIManagerCLI.repo_export(connection, repo)
+            time.sleep(3)
+            relative_path = RHUIManagerCLI.repo_info(connection, repo)["relativepath"]
+            repodata_file = f"{base_path}/{relative_path}/repodata/repomd.xml"
+            _, stdout, _ = connection.exec_command(f"cat {repodata_file}")
+            cached = RepodataCache.store(repo, relative_path, stdout.read())
+        location = cached["locations"].get(datatype)
+        if location:
+            wanted_file = f"{base_path}/{cached['relativepath']}/{location}"
             return wanted_file
         return None
 
+    @staticmethod
+    def repodata_items(connection, repo, datatype):
+        """yield packages, package files, advisories, or groups from the repo, one at a time"""
+        # for the primary, filelists, updateinfo, and group data types, respectively
+        parser = PARSERS[datatype]
+        location = Yummy.repodata_location(connection, repo, datatype)
+        if not location:
+            return
+        with metadata.open_remote(connection, location) as stream:
+            yield from parser(stream)
+
     @staticmethod
     def comps_xml_grouplist(connection, comps_xml, uservisible_only=True):
         """return a sorted list of yum groups in the given comps.xml file"""
         # by default, only groups with <uservisible>true</uservisible> are taken into account,
         # but those "invisible" can be included too, if requested
-        _, stdout, _ = connection.exec_command(f"cat {comps_xml}")
-        comps = xmltodict.parse(stdout.read())
-        # in a multi-group comps.xml file, the groups are in a list,
-        # whereas in a single-group file, the group is just a string
-        if isinstance(comps["comps"]["group"], list):
-            # get a list of name-visibility pairs first
-            group_info = [[group["name"][0], group["uservisible"].lower() == "true"] \
-                          for group in comps["comps"]["group"]]
-            if uservisible_only:
-                grouplist = [group[0] for group in group_info if group[1]]
-            else:
-                grouplist = [group[0] for group in group_info]
-            return sorted(grouplist)
-        if uservisible_only:
-            if comps["comps"]["group"]["uservisible"].lower() == "true":
-                return [comps["comps"]["group"]["name"][0]]
-            return []
-        return [comps["comps"]["group"]["name"][0]]
+        with metadata.open_remote(connection, comps_xml) as stream:
+            grouplist = [group["name"] for group in metadata.groups(stream) \
+                         if group["uservisible"] or not uservisible_only]
+        return sorted(grouplist)
 
     @staticmethod
     def comps_xml_langpacks(connection, comps_xml):
         """return a list of name, package tuples for the langpacks from the given comps.xml file"""
         # or None if there are no langpacks
-        _, stdout, _ = connection.exec_command(f"cat {comps_xml}")
-        comps = xmltodict.parse(stdout.read())
-        if "langpacks" in comps["comps"] and comps["comps"]["langpacks"]:
-            names_pkgs = [(match["@name"], match["@install"]) \
-                          for match in comps["comps"]["langpacks"]["match"]]
-            return names_pkgs
-        return None
+        with metadata.open_remote(connection, comps_xml) as stream:
+            names_pkgs = list(metadata.langpacks(stream))
+        return names_pkgs or None
 
     @staticmethod
     def grouplist(connection):
         """return a sorted list of yum groups available to the client"""
-        # first clean metadata, which may contain outdated information
-        Expect.expect_retval(connection, "yum clean all")
-        # fetch the complete output from the command
-        _, stdout, _ = connection.exec_command("yum grouplist")
-        all_lines = stdout.read().decode().splitlines()
-        # yum groups are on lines that start with three spaces
-        grouplist = [line.strip() for line in all_lines if line.startswith("   ")]
-        return sorted(grouplist)
+        # first download fresh metadata, as the cached one may contain outdated information
+        return YumSession.get(connection).grouplist(fresh=True)
 
     @staticmethod
     def group_packages(connection, group):
         """return a sorted list of packages available to the client in the given yum group"""
-        # fetch the complete output from the command
-        _, stdout, _ = connection.exec_command(f"yum groupinfo '{group}'")
-        all_lines = stdout.read().decode().splitlines()
-        # packages are on lines that start with three spaces
-        packagelist = [line.strip() for line in all_lines if line.startswith("   ")]
-        # in addition, the package names can start with +, -, or = depending on the status
-        # (see man yum -> groups)
-        # so, let's remove such signs if they're present
-        packagelist = [pkg[1:] if pkg[0] in ["+", "-", "="] else pkg for pkg in packagelist]
-        return sorted(packagelist)
+        return YumSession.get(connection).group_packages(group)
 
     @staticmethod
     def repolist(connection, alll=False, enabled=True, disabled=False):
         """return a list of yum repositories, only enabled by default"""
-        cmd = "yum -q repolist"
-        if alll:
-            cmd += " all"
-        elif disabled:
-            cmd += " disabled"
-        elif enabled:
-            pass
-        else:
-            raise ValueError("You cannot turn all options off.")
+        cmd = "yum -q repolist" + _repolist_args(alll, enabled, disabled)
         _, stdout, _ = connection.exec_command(cmd)
-        raw_output = stdout.read().decode().splitlines()
-        repos = [line.split()[0] for line in raw_output if not line.startswith("repo ")]
-        # on RHEL 7, the repos are in fact like .../7Server/x86_64; strip that
-        repos = [repo.split("/")[0] for repo in repos]
-        return repos
+        return _parse_repolist(stdout.read().decode().splitlines())
+
+    @staticmethod
+    def module_list(connection, package):
+        """return information module streams for the package, exactly as presented by dnf"""
+        cmd = f"dnf -q module list {package}"
+        _, stdout, _ = connection.exec_command(cmd)
+        raw_module_list_output = stdout.read().decode()
+        return raw_module_list_output
+
+    @staticmethod
+    def dnf_query(connection, queries, cacheonly=False):
+        """answer a list of queries via the dnf (or yum) API on the client; return the results"""
+        # see agents/dnf_query.py for the supported queries and the format of the results
+        args = [json.dumps(queries)] + (["--cacheonly"] if cacheonly else [])
+        return agents.run(connection, "dnf_query", args, python=agents.SYSTEM_PYTHON)
 
     @staticmethod
     def install(connection, packages, gpgcheck=True, timeout=20, expect_trouble=False):
@@ -136,14 +169,6 @@ class Yummy():
         cmd += " ".join(packages) if packages else ""
         return connection.recv_exit_status(cmd, timeout=60) == (100 if expect_update else 0)
 
-    @staticmethod
-    def module_list(connection, package):
-        """return information module streams for the package, exactly as presented by dnf"""
-        cmd = f"dnf -q module list {package}"
-        _, stdout, _ = connection.exec_command(cmd)
-        raw_module_list_output = stdout.read().decode()
-        return raw_module_list_output
-
     @staticmethod
     def download(connection, packages, downloaddir="", timeout=20, expect_trouble=False):
         """download packages"""
@@ -152,3 +177,113 @@ class Yummy():
         if downloaddir:
             cmd += " --downloaddir " + downloaddir
         Expect.expect_retval(connection, cmd, 1 if expect_trouble else 0, timeout)
+
+class YumSession():
+    """
+    yum metadata on a client, downloaded once and reused by subsequent queries
+
+    The metadata is downloaded again only if the yum configuration or the RHUI certificates
+    on the client change, or if the content of any repo on the RHUA changes (as reported
+    by RepodataCache), if a query asks for fresh metadata, or if the cache turns out to be
+    missing. Queries use the cache only and can be batched into one command.
+    """
+    _sessions = weakref.WeakKeyDictionary()
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.state = None
+
+    @staticmethod
+    def get(connection):
+        """return the session for the client connection"""
+        # the session refers to the connection weakly, or the connection would never be freed
+        if connection not in YumSession._sessions:
+            YumSession._sessions[connection] = YumSession(weakref.proxy(connection))
+        return YumSession._sessions[connection]
+
+    def _current_state(self):
+        """return the fingerprint of the client configuration and the repo content generation"""
+        _, stdout, _ = self.connection.exec_command(FINGERPRINT_CMD)
+        return stdout.read().decode().strip(), RepodataCache.generation()
+
+    def refresh(self, force=False):
+        """download fresh metadata if the cached metadata may be outdated"""
+        state = self._current_state()
+        if force or state != self.state:
+            Expect.expect_retval(self.connection, "yum clean all && yum makecache", timeout=300)
+            self.state = state
+
+    def invalidate(self):
+        """make sure the metadata will be downloaded again before the next query"""
+        self.state = None
+
+    def _run(self, commands):
+        """run the commands; return the output lines of each, and whether the cache was missed"""
+        cmd = "; ".join(f"{command}; echo {SESSION_SEPARATOR} $?" for command in commands)
+        _, stdout, stderr = self.connection.exec_command(cmd)
+        results = []
+        lines = []
+        for line in stdout.read().decode().splitlines():
+            if line.startswith(SESSION_SEPARATOR):
+                results.append(lines)
+                lines = []
+            else:
+                lines.append(line)
+        cache_missed = len(results) != len(commands) or \
+                       bool(CACHE_MISS_RE.search(stderr.read().decode()))
+        return results, cache_missed
+
+    def query(self, queries, fresh=False):
+        """run several queries at once in the cache-only mode; return a list of results"""
+        # queries are tuples: ("grouplist",), ("groupinfo", group), ("module_list", package),
+        # ("repolist", all, enabled, disabled); fresh: download the metadata first in any case
+        commands = []
+        parsers = []
+        for query in queries:
+            if query[0] == "grouplist":
+                commands.append("yum -C grouplist")
+                parsers.append(_parse_grouplist)
+            elif query[0] == "groupinfo":
+                commands.append(f"yum -C groupinfo {shlex.quote(query[1])}")
+                parsers.append(_parse_group_packages)
+            elif query[0] == "module_list":
+                commands.append(f"dnf -C -q module list {shlex.quote(query[1])}")
+                parsers.append(lambda lines: "\n".join(lines) + "\n" if lines else "")
+            elif query[0] == "repolist":
+                commands.append("yum -C -q repolist" + _repolist_args(*query[1:]))
+                parsers.append(_parse_repolist)
+            else:
+                raise ValueError(f"Unknown query: {query[0]}")
+        self.refresh(force=fresh)
+        results, cache_missed = self._run(commands)
+        # the cache may have been cleaned behind our back; try again with fresh metadata
+        # (other failures, such as a query for a nonexistent group, are just reported as such)
+        if cache_missed:
+            self.refresh(force=True)
+            results, _ = self._run(commands)
+        return [parser(lines) for parser, lines in zip(parsers, results)]
+
+    def api_query(self, queries):
+        """answer queries via the dnf (or yum) API using the cached metadata; see dnf_query"""
+        self.refresh()
+        try:
+            return Yummy.dnf_query(self.connection, queries, cacheonly=True)
+        except agents.AgentError:
+            self.refresh(force=True)
+            return Yummy.dnf_query(self.connection, queries, cacheonly=True)
+
+    def grouplist(self, fresh=False):
+        """return a sorted list of yum groups"""
+        return self.query([("grouplist",)], fresh)[0]
+
+    def group_packages(self, group):
+        """return a sorted list of packages in the given yum group"""
+        return self.query([("groupinfo", group)])[0]
+
+    def repolist(self, alll=False, enabled=True, disabled=False):
+        """return a list of yum repositories, only enabled by default"""
+        return self.query([("repolist", alll, enabled, disabled)])[0]
+
+    def module_list(self, package):
+        """return information module streams for the package, exactly as presented by dnf"""
+        return self.query([("module_list", package)])[0]
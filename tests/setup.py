@@ -8,7 +8,7 @@ from glob import glob
 
 from setuptools import setup
 
-REQUIREMENTS = ['pynose', 'requests', 'stitches', 'xmltodict']
+REQUIREMENTS = ['pynose', 'requests', 'stitches']
 
 DATAFILES = [('share/rhui5_tests_lib/rhui5_tests', glob('rhui5_tests/test_*.py')),
              ('/etc/rhui5_tests/', ['rhui5_tests/tested_repos.yaml']),
@@ -24,7 +24,8 @@ setup(name='rhui5_tests_lib',
       url='https://github.com/RedHatQE/rhui5-automation',
       license="GPLv3+",
       packages=[
-          'rhui5_tests_lib'
+          'rhui5_tests_lib',
+          'rhui5_tests_lib.agents'
       ],
       data_files=DATAFILES,
       install_requires=REQUIREMENTS,